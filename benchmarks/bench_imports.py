@@ -0,0 +1,78 @@
+"""
+Cold import time of the app and report entry points, each in a fresh
+interpreter, and which heavy dependencies each one pulls in at import.
+Headless entry points must not import streamlit; --check exits non-zero if they do.
+
+    python benchmarks/bench_imports.py --repeat 5 --check
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ["streamlit", "openai", "instaloader", "yt_dlp", "bs4", "praw", "apify_client", "dotenv", "tiktoken"]
+
+# (module, headless?)
+ENTRY_POINTS = [
+    ("report_with_logging", True),
+    ("send_mail", True),
+    ("email_project.email_summarize_chunks", True),
+    ("email_project.email_fetch_captions", True),
+    ("project_code.summaries", True),
+    ("project_code.summarize_chunks", True),
+    ("project_code.fetch_captions", True),
+    ("utils.logger", True),
+    ("streamlit", False),  # floor for the app: streamlit itself
+]
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(module, repeat):
+    env = dict(os.environ)
+    # No key and no .env side effects: imports must not need either
+    env.pop("OPENAI_API_KEY", None)
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1:]
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(r["seconds"] for r in runs), runs[-1]["loaded"]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="fail if a headless entry point imports streamlit")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':42s} {'median s':>9s}  heavy deps loaded")
+    for module, headless in ENTRY_POINTS:
+        seconds, loaded = measure(module, args.repeat)
+        if seconds is None:
+            print(f"{module:42s} {'ERROR':>9s}  {' '.join(loaded)}")
+            failures.append(module)
+            continue
+        print(f"{module:42s} {seconds:9.2f}  {', '.join(loaded) or '-'}")
+        if headless and "streamlit" in loaded:
+            failures.append(module)
+    if args.check and failures:
+        print(f"FAILED: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,39 @@
-import instaloader
 import csv
 import re
 import os
-import streamlit as st
-import yt_dlp
-import requests
-from bs4 import BeautifulSoup
+import time
+from project_code import clients, http_client, youtube_api
+from project_code.enrichment_cache import USE_ENRICH_CACHE, canonical_url, get_enrichment_cache
+from project_code.worker_pool import HostLimitedPool
 # import snscrape.modules.twitter as sntwitter
 from pathlib import Path
-import praw
+
+YOUTUBE_STAT_FIELDS = ["view_count", "like_count", "comment_count"]
+
+# Concurrent lookups allowed per host while enriching (Instagram is the touchiest)
+HOST_LIMITS = {
+    "instagram.com": int(os.getenv("ENRICH_INSTAGRAM_CONCURRENCY", "2")),
+    "googleapis.com": int(os.getenv("ENRICH_GOOGLEAPIS_CONCURRENCY", "4")),
+    "reddit.com": int(os.getenv("ENRICH_REDDIT_CONCURRENCY", "4")),
+}
+ENRICH_MAX_WORKERS = int(os.getenv("ENRICH_MAX_WORKERS", "16"))
+
+# Reddit's /api/info resolves up to 100 fullnames (t3_ posts, t1_ comments) per request
+REDDIT_INFO_BATCH = 100
+
+# Fetch results that carry no caption. NOT_FOUND means the platform confirmed
+# the post is gone (404, or absent from a successful response) and may be
+# cached as missing; FETCH_FAILED (rate limits, 5xx, network errors) must not
+# be cached, so the post is tried again next run.
+NOT_FOUND = object()
+FETCH_FAILED = object()
+
+# Long-lived API clients, created on first use and shared by all worker threads
+def get_instaloader():
+    return clients.shared("instaloader", lambda: clients.lazy_import("instaloader").Instaloader())
+
+def get_reddit_client():
+    return clients.shared("reddit", make_reddit_client)
 
 # For Instaloader, need to extract shortcode from URL
 def extract_shortcode(url):
@@ -16,49 +41,40 @@ def extract_shortcode(url):
     return match.group(1) if match else None
 
 def fetch_instagram_captions(shortcode):
-    L = instaloader.Instaloader()
+    """The post's caption (None if it has none), NOT_FOUND, or FETCH_FAILED."""
+    L = get_instaloader()
+    instaloader = clients.lazy_import("instaloader")
     try:
         # log_to_browser(f"Fetching Instagram caption for {shortcode}")
         post = instaloader.Post.from_shortcode(L.context, shortcode)
         return post.caption
+    except instaloader.exceptions.QueryReturnedNotFoundException:
+        return NOT_FOUND
     except Exception as e:
         print(f"Error fetching caption for {shortcode}: {e}")
-        return ""
+        return FETCH_FAILED
 
 # Using YouTube API Key
 def fetch_youtube_title(video_url: str) -> str | None:
     """Fetch a YouTube video title via YouTube Data API v3."""
-    api_key = os.getenv("YOUTUBE_API_KEY")
-    if not api_key:
+    if not os.getenv("YOUTUBE_API_KEY"):
         print("❌ YOUTUBE_API_KEY not set — skipping YouTube title fetch")
         return None
 
     # Extract video ID from the URL
-    match = re.search(r"(?:v=|youtu\.be/)([A-Za-z0-9_-]{11})", video_url)
-    if not match:
+    video_id = youtube_api.extract_video_id(video_url)
+    if not video_id:
         print(f"❌ Invalid YouTube URL: {video_url}")
         return None
-    video_id = match.group(1)
 
-    # Call the API
-    url = (
-        f"https://www.googleapis.com/youtube/v3/videos"
-        f"?part=snippet&id={video_id}&key={api_key}"
-    )
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        items = data.get("items", [])
-        if not items:
-            print(f"⚠️ No video found for ID {video_id}")
-            return None
-        return items[0]["snippet"]["title"]
-    except Exception as e:
-        print(f"❌ Failed to fetch YouTube title: {e}")
+    info = youtube_api.fetch_videos([video_id]).get(video_id)
+    if not info:
+        print(f"⚠️ No video found for ID {video_id}")
         return None
+    return info["title"]
 
 def make_reddit_client():
+    praw = clients.lazy_import("praw")
     return praw.Reddit(
         client_id=os.getenv("REDDIT_CLIENT_ID"),
         client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
@@ -67,113 +83,297 @@ def make_reddit_client():
         ratelimit_seconds=60,
     )
 
-def fetch_reddit_post_api(url: str):
-    import re
-    def _extract_submission_id(u: str):
-        for pat in (r"/comments/([a-z0-9]{5,8})", r"redd\.it/([a-z0-9]{5,8})"):
-            m = re.search(pat, u, re.I)
-            if m: return m.group(1)
+def _extract_submission_id(u: str):
+    for pat in (r"/comments/([a-z0-9]{5,8})", r"redd\.it/([a-z0-9]{5,8})"):
+        m = re.search(pat, u, re.I)
+        if m: return m.group(1)
+    return None
+
+def _extract_comment_id(u: str):
+    # /comments/<post>/<slug>/<comment>/ or /comments/<post>/comment/<comment>/
+    m = re.search(r"/comments/[a-z0-9]+/[^/]+/([a-z0-9]+)", u, re.I)
+    return m.group(1) if m else None
+
+def reddit_fullname(platform: str, url: str):
+    """The /api/info fullname for a Reddit row: t3_<id> for posts, t1_<id> for comments."""
+    if platform == "reddit_comments":
+        comment_id = _extract_comment_id(url)
+        return f"t1_{comment_id.lower()}" if comment_id else None
+    sub_id = _extract_submission_id(url)
+    return f"t3_{sub_id.lower()}" if sub_id else None
+
+def fetch_reddit_info(fullnames):
+    """
+    Resolve up to REDDIT_INFO_BATCH fullnames with one /api/info request.
+    Returns {fullname: entry}; fullnames that are absent no longer exist.
+    Returns None if the request failed.
+    """
+    try:
+        things = list(get_reddit_client().info(fullnames=list(fullnames)))
+    except Exception as e:
+        print(f"[Reddit API] Failed to fetch {len(fullnames)} item(s) via /api/info: {e}")
         return None
+    found = {}
+    for thing in things:
+        author = str(thing.author) if getattr(thing, "author", None) else ""
+        if thing.fullname.startswith("t3_"):
+            found[thing.fullname] = {"caption": (thing.title or "").strip(), "body": thing.selftext or "", "author": author}
+        else:
+            found[thing.fullname] = {"caption": (thing.body or "").strip(), "author": author}
+    return found
 
+def fetch_reddit_post_api(url: str):
+    """(title, body), NOT_FOUND, or FETCH_FAILED."""
     sub_id = _extract_submission_id(url)
     if not sub_id:
         print(f"[Reddit API] Could not parse submission id from: {url}")
-        return None, None
+        return NOT_FOUND
 
-    reddit = make_reddit_client()
-    sub = reddit.submission(id=sub_id)
-    # Touch attributes to fetch
-    title = sub.title or ""
-    body = sub.selftext or ""
+    prawcore = clients.lazy_import("prawcore")
+    try:
+        sub = get_reddit_client().submission(id=sub_id)
+        # Touch attributes to fetch
+        title = sub.title or ""
+        body = sub.selftext or ""
+    except prawcore.exceptions.NotFound:
+        return NOT_FOUND
+    except Exception as e:
+        print(f"[Reddit API] Failed to fetch submission {sub_id}: {e}")
+        return FETCH_FAILED
     return title, body
     
 def fetch_reddit_comment(url):
+    """(body, author), NOT_FOUND, or FETCH_FAILED."""
     if not url.endswith(".json"):
         url = url.rstrip("/") + ".json"
     headers = {'User-Agent': 'trend-monitor/0.1'}
     try: 
         # log_to_browser(f"Fetching Reddit comment from {url}")
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
+        if response.status_code == 404:
+            return NOT_FOUND
+        response.raise_for_status()
         data = response.json()
-
-        # The comment is in the second object (index 1), under "children"
-        comment_data = data[1]['data']['children'][0]['data']
-        comment_body = comment_data.get('body', '[no body]')
-        author = comment_data.get('author', '[uknown]')
-        return comment_body, author
     except Exception as e:
         print(f"Error fetching Reddit comment ({url}): {e}")
-        return None, None
+        return FETCH_FAILED
+
+    # The comment is in the second object (index 1), under "children"
+    try:
+        comment_data = data[1]['data']['children'][0]['data']
+    except (IndexError, KeyError, TypeError):
+        return NOT_FOUND
+    comment_body = comment_data.get('body', '[no body]')
+    author = comment_data.get('author', '[uknown]')
+    return comment_body, author
 
-def enrich_captions(input_file, output_file, st=None):
+def _plan_fetch(platform, url, row):
+    """(host, fn, args) for rows that need a network lookup, else None."""
+    if not url:
+        return None
+    content = (row.get("content") or row.get("snippet") or "").strip()
+    if platform == "instagram":
+        shortcode = extract_shortcode(url)
+        return ("instagram.com", fetch_instagram_captions, (shortcode,)) if shortcode else None
+    if platform == "reddit_posts" and not content:
+        return ("reddit.com", fetch_reddit_post_api, (url,))
+    if platform == "reddit_comments" and not content:
+        return ("reddit.com", fetch_reddit_comment, (url,))
+    return None
+
+def _to_entry(platform, fetched):
+    """
+    Turn a fetch result into an enrichment-cache entry. Returns None for
+    FETCH_FAILED, so transient failures are never cached as missing.
+    """
+    if fetched is FETCH_FAILED:
+        return None
+    if fetched is NOT_FOUND:
+        return {"caption": "", "missing": True}
+    if platform == "instagram":
+        # None is a post without a caption
+        return {"caption": fetched or ""}
+    if platform == "reddit_posts":
+        title, body = fetched
+        return {"caption": (title or "").strip(), "body": body or ""}
+    if platform == "reddit_comments":
+        comment_text, author = fetched
+        return {"caption": (comment_text or "").strip(), "author": author or ""}
+    return None
+
+def _youtube_entry(info):
+    if info is None:
+        return {"caption": "", "missing": True}
+    entry = {"caption": info.get("title") or "", "body": info.get("description") or ""}
+    for field in YOUTUBE_STAT_FIELDS:
+        entry[field] = info.get(field) or ""
+    return entry
+
+def _apply_entry(row, entry):
+    row["caption"] = entry.get("caption") or ""
+    row["body"] = entry.get("body") or row.get("body", "") or ""
+    if entry.get("author") and "author" in row:
+        row["author"] = entry["author"]
+    for field in YOUTUBE_STAT_FIELDS:
+        if field in entry:
+            row[field] = entry[field]
+
+def enrich_captions(input_file, output_file, st=None, host_limits=None, max_workers=ENRICH_MAX_WORKERS, use_cache=None):
+    """
+    Add caption/body (and YouTube stats) columns to the ingestion CSV.
+    Lookups are served from the enrichment cache when possible; the rest run on
+    a shared pool capped per host (HOST_LIMITS, overridable with `host_limits`).
+    Rows that already carry their text are copied straight through. Output rows
+    keep the input order. `use_cache=False` bypasses the cache (defaults to ENRICH_CACHE).
+    """
     # allow headless mode (no Streamlit UI in CI)
     class _NullSt:
         def __getattr__(self, _): return lambda *a, **k: None
     st = st or _NullSt()
+    use_cache = USE_ENRICH_CACHE if use_cache is None else use_cache
+    cache = get_enrichment_cache() if use_cache else None
+    if cache:
+        cache.reset_stats()
 
-    with open(input_file, newline='', encoding='utf-8') as infile, \
-         open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-
+    with open(input_file, newline='', encoding='utf-8') as infile:
         reader = csv.DictReader(infile)
-
-        # Ensure 'caption' and 'body' appear exactly once in header
         base_fields = reader.fieldnames or []
-        fieldnames = list(dict.fromkeys(base_fields + ['caption', 'body']))
-
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-
         rows = list(reader)
 
-        for i, row in enumerate(rows, start=1):
-            # Normalize platform safely
+    # Ensure 'caption' and 'body' appear exactly once in header
+    fieldnames = list(dict.fromkeys(base_fields + ['caption', 'body'] + YOUTUBE_STAT_FIELDS))
+
+    started = time.perf_counter()
+    limits = {**HOST_LIMITS, **(host_limits or {})}
+    entries, futures, per_host = {}, {}, {}
+    inflight = {}  # canonical URL -> future, so repeated URLs are fetched once
+    youtube_rows = {}  # row index -> video id still to fetch
+    reddit_rows = {}  # row index -> fullname still to fetch
+    with HostLimitedPool(limits, max_workers=max_workers) as pool:
+        for i, row in enumerate(rows):
             platform = (row.get("platform") or "").strip().lower()
             url = (row.get("url") or "").strip()
+            video_id = youtube_api.extract_video_id(url) if platform == "youtube" else None
+            plan = _plan_fetch(platform, url, row)
+            if not (plan or video_id):
+                continue
+            cached = cache.lookup(platform, url) if cache else None
+            fullname = reddit_fullname(platform, url) if plan and plan[0] == "reddit.com" else None
+            if cached is not None:
+                entries[i] = cached
+            elif video_id:
+                youtube_rows[i] = video_id
+            elif fullname:
+                reddit_rows[i] = fullname
+            else:
+                key = canonical_url(url)
+                if key not in inflight:
+                    host, fn, args = plan
+                    inflight[key] = pool.submit(host, fn, *args)
+                    per_host[host] = per_host.get(host, 0) + 1
+                futures[i] = inflight[key]
+
+        # YouTube: one videos.list call per 50 uncached IDs, under the googleapis cap
+        yt_batches = youtube_api.batched(youtube_rows.values()) if os.getenv("YOUTUBE_API_KEY") else []
+        if youtube_rows and not yt_batches:
+            print("❌ YOUTUBE_API_KEY not set — skipping YouTube lookups")
+        yt_futures = [(batch, pool.submit("googleapis.com", youtube_api.fetch_batch, batch)) for batch in yt_batches]
+        if yt_batches:
+            per_host["googleapis.com"] = len(yt_batches)
+
+        # Reddit: one /api/info call per 100 uncached posts/comments
+        fullnames = list(dict.fromkeys(reddit_rows.values()))
+        reddit_batches = [fullnames[j:j + REDDIT_INFO_BATCH] for j in range(0, len(fullnames), REDDIT_INFO_BATCH)]
+        reddit_futures = [(batch, pool.submit("reddit.com", fetch_reddit_info, batch)) for batch in reddit_batches]
+        if reddit_batches:
+            per_host["reddit.com"] = per_host.get("reddit.com", 0) + len(reddit_batches)
+
+        things = {}
+        for batch, future in reddit_futures:
+            found = future.result()
+            if found is None:
+                continue  # request failed; leave these uncached
+            for name in batch:
+                # Absent from a successful response: the post/comment is gone
+                things[name] = found.get(name) or {"caption": "", "missing": True}
+        for i, name in reddit_rows.items():
+            if name in things:
+                entries[i] = things[name]
+                if cache:
+                    cache.store(rows[i]["platform"].strip().lower(), rows[i]["url"], things[name])
+
+        videos = {}
+        for batch, future in yt_futures:
+            found = future.result()
+            if found is None:
+                continue  # call failed; leave these uncached
+            for video_id in batch:
+                videos[video_id] = _youtube_entry(found.get(video_id))
+        for i, video_id in youtube_rows.items():
+            if video_id in videos:
+                entries[i] = videos[video_id]
+                if cache:
+                    cache.store("youtube", rows[i]["url"], videos[video_id])
+
+        with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+            writer.writeheader()
+
+            for i, row in enumerate(rows):
+                # Normalize platform safely
+                platform = (row.get("platform") or "").strip().lower()
+                url = (row.get("url") or "").strip()
+
+                try:
+                    if i in futures:
+                        entry = _to_entry(platform, futures[i].result())
+                        if entry is not None:
+                            entries[i] = entry
+                            if cache:
+                                cache.store(platform, url, entry)
+
+                    if i in entries:
+                        _apply_entry(row, entries[i])
+
+                    elif platform == "youtube" and url:
+                        row["caption"] = ""
+                        row["body"] = ""
+
+                    elif platform in ("reddit_posts", "reddit_comments"):
+                        # ForumScout gives reddit text in 'snippet' or you already stored it in 'content'
+                        row["caption"] = (row.get("content") or row.get("snippet") or "").strip()
+                        row["body"] = row.get("body", "") or ""
+
+                    elif platform == "tiktok":
+                        # Your TikTok pipeline already stores the caption/description in 'content'
+                        row["caption"] = (row.get("content") or "").strip()
+
+                    elif platform == "twitter" and url:
+                        row["caption"] = row["content"]
+
+                    else:
+                        row["caption"] = row.get("caption", "") or ""
 
-            try:
-                if platform == "instagram" and url:
-                    shortcode = extract_shortcode(url)
-                    row["caption"] = fetch_instagram_captions(shortcode) if shortcode else ""
-
-                elif platform == "youtube" and url:
-                    # Prefer API-based fetch in CI to avoid cookies hassle
-                    row["caption"] = fetch_youtube_title(url) or ""
-
-                elif platform == "reddit_posts":
-                    # ForumScout gives reddit post text in 'snippet' or you already stored it in 'content'
-                    row["caption"] = (row.get("content") or row.get("snippet") or "").strip()
-                    # If you also want to keep a separate body column, set it too:
-                    row["body"] = row.get("body", "") or ""  # or fill with something else if you fetch full text
-
-                elif platform == "reddit_comments" and url:
-                    # comment_text, author = fetch_reddit_comment(url)
-                    # if author:
-                    #     row["author"] = author
-                    # row["caption"] = (comment_text or "").strip()
-                    row["caption"] = (row.get("content") or row.get("snippet") or "").strip()
-
-                elif platform == "tiktok":
-                    # Your TikTok pipeline already stores the caption/description in 'content'
-                    row["caption"] = (row.get("content") or "").strip()
-                
-                elif row["platform"] == "twitter" and row["url"]:
-                    row["caption"] = row["content"]
-                    
-                else:
+                except Exception as e:
+                    # Don’t fail the whole export on a single row
+                    print(f"[enrich_captions] Error on platform={platform} url={url}: {e}")
                     row["caption"] = row.get("caption", "") or ""
+                    # keep body if present; otherwise empty
+                    row["body"] = row.get("body", "") or ""
 
-            except Exception as e:
-                # Don’t fail the whole export on a single row
-                print(f"[enrich_captions] Error on platform={platform} url={url}: {e}")
-                row["caption"] = row.get("caption", "") or ""
-                # keep body if present; otherwise empty
-                row["body"] = row.get("body", "") or ""
+                # Ensure all expected fields exist before writing (DictWriter drops unknown keys)
+                for f in fieldnames:
+                    row.setdefault(f, "")
 
-            # Ensure all expected fields exist before writing (DictWriter drops unknown keys)
-            for f in fieldnames:
-                row.setdefault(f, "")
+                writer.writerow(row)
 
-            writer.writerow(row)
+    hosts = ", ".join(f"{h}={n}" for h, n in sorted(per_host.items())) or "none"
+    fetched = len(futures) + len(youtube_rows) + len(reddit_rows)
+    print(f"[enrich_captions] {len(rows)} rows: {sum(per_host.values())} request(s) ({hosts}) for {fetched} row(s), "
+          f"{len(rows) - fetched} served from cache or passed through in {time.perf_counter() - started:.1f}s")
+    if cache:
+        for line in cache.format_stats():
+            print(f"[enrich_captions] cache | {line}")
 
 if __name__ == "__main__":
     enrich_captions("output/forumscout_data.csv", "output/forumscout_data_with_captions.csv")
@@ -1,23 +1,54 @@
 import os
-import re
 import json
-import openai
 import pandas as pd
-from dotenv import load_dotenv
 from pathlib import Path
 from typing import List, Dict, Any
-
-# Load environment variables
-load_dotenv()
-client = openai.OpenAI()
+from project_code import clients
+from project_code.chunking import add_token_counts, chunk_frame
+from project_code.clustering import CLUSTER_NOTE, USE_CLUSTERING, cluster_note, condense_posts
+from project_code.llm_batch import USE_BATCH_MODE, BatchRunner
+from project_code.llm_cache import cached_completion
+from project_code.llm_scheduler import LLMScheduler
+from project_code.structured_output import json_schema_format, parse_structured
 
 BASE_DIR   = Path(__file__).resolve().parent.parent  # go up to project root
 OUTPUT_DIR = BASE_DIR / "output"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 CLEAN_CSV = OUTPUT_DIR / "forumscout_cleaned_data.csv"
 CHUNKS_MD = OUTPUT_DIR / "gpt_narrative_summary.md"
 
+# Chunk and merge calls must return this shape (enforced via response_format)
+_STRING = {"type": "string"}
+NARRATIVES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "narratives": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": _STRING,
+                    "summary": _STRING,
+                    "examples": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {"handle": _STRING, "excerpt": _STRING, "url": _STRING},
+                            "required": ["handle", "excerpt", "url"],
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["name", "summary", "examples"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["narratives"],
+    "additionalProperties": False,
+}
+NARRATIVES_FORMAT = json_schema_format("narratives", NARRATIVES_SCHEMA)
+
 # ---------- Helpers ----------
 def _infer_platform_from_url(u: str) -> str:
     u = (u or "").lower()
@@ -34,27 +65,19 @@ def _fmt_post(p: Dict[str, Any]) -> str:
         cap = cap[:277] + "..."
     author = (p.get("author") or "").strip() or "unknown"
     url = (p.get("url") or "").strip()
-    return f'- @{author}: "{cap}" ({url})'
+    return f'- @{author}: "{cap}" ({url}){cluster_note(p)}'
 
-def _extract_json(text: str) -> Dict[str, Any]:
-    """Parse model output into JSON; supports raw JSON or ```json blocks."""
+def _parse_narratives(text: str) -> Dict[str, Any]:
+    """Model output -> narratives JSON; raises ValueError if none is found or it breaks the schema."""
+    return parse_structured(text, NARRATIVES_SCHEMA)
+
+def _valid_narratives(text: str) -> bool:
+    """True if `text` parses as narratives JSON; only such answers go into the LLM cache."""
     try:
-        return json.loads(text)
-    except Exception:
-        pass
-    m = re.search(r"```json\s*(\{.*?\})\s*```", text, flags=re.S)
-    if m:
-        try:
-            return json.loads(m.group(1))
-        except Exception:
-            pass
-    m = re.search(r"(\{(?:[^{}]|(?1))*\})", text, flags=re.S)
-    if m:
-        try:
-            return json.loads(m.group(1))
-        except Exception:
-            pass
-    raise ValueError("Could not parse JSON from model output")
+        _parse_narratives(text)
+    except ValueError:
+        return False
+    return True
 
 def _platform_display_name(p: str) -> str:
     m = {
@@ -101,8 +124,9 @@ def _render_markdown(platform_name: str, final_json: dict) -> str:
     # trailing newline for file friendliness
     return "\n".join(lines).rstrip() + "\n"
 
-def _gpt_chunk(platform_name: str, posts_chunk: List[Dict[str, Any]], model: str, temp: float) -> Dict[str, Any]:
+def _chunk_request(platform_name: str, posts_chunk: List[Dict[str, Any]], model: str, temp: float) -> Dict[str, Any]:
     formatted = "\n".join(_fmt_post(p) for p in posts_chunk)
+    clustered = any(cluster_note(p) for p in posts_chunk)
     prompt = f"""
 You are analyzing posts from **{platform_name}** about humanitarian and political issues in Gaza.
 From ONLY the posts below, produce **2–3 candidate narratives** in **compact JSON** with this exact schema:
@@ -126,21 +150,21 @@ Rules:
 - Provide **5–10 examples per narrative** (each must include @handle, short excerpt, and URL).
 - If a Twitter/X example has author "unknown", try to infer the @handle from the URL or text.
 - Output **only** valid JSON. No commentary.
-
+{("- " + CLUSTER_NOTE) if clustered else ""}
 Posts:
 {formatted}
 """
-    resp = client.chat.completions.create(
+    return dict(
         model=model,
         messages=[
             {"role": "system", "content": "You output only valid JSON that matches the requested schema."},
             {"role": "user", "content": prompt},
         ],
-        temperature=temp
+        temperature=temp,
+        response_format=NARRATIVES_FORMAT,
     )
-    return _extract_json(resp.choices[0].message.content)
 
-def _gpt_merge(platform_name: str, json_a: Dict[str, Any], json_b: Dict[str, Any], model: str, temp: float) -> Dict[str, Any]:
+def _merge_request(platform_name: str, json_a: Dict[str, Any], json_b: Dict[str, Any], model: str, temp: float) -> Dict[str, Any]:
     prompt = f"""
 You are consolidating narratives for **{platform_name}**.
 
@@ -156,26 +180,118 @@ JSON A:
 JSON B:
 {json.dumps(json_b, ensure_ascii=False)}
 """
-    resp = client.chat.completions.create(
+    return dict(
         model=model,
         messages=[
             {"role": "system", "content": "You output only valid JSON that matches the requested schema."},
             {"role": "user", "content": prompt},
         ],
-        temperature=temp
+        temperature=temp,
+        response_format=NARRATIVES_FORMAT,
     )
-    return _extract_json(resp.choices[0].message.content)
+
+def _repair_request(request: Dict[str, Any], content: str, error: str) -> Dict[str, Any]:
+    """Follow-up to `request` pointing out what was wrong with its answer `content`."""
+    return dict(
+        request,
+        messages=request["messages"] + [
+            {"role": "assistant", "content": content or ""},
+            {"role": "user", "content": f"That output is not valid: {error}. "
+                                        "Reply with the corrected JSON only, keeping everything that was valid."},
+        ],
+    )
+
+def _run_parsed(run_requests, requests: List[Dict[str, Any]], labels: List[str]) -> List[Dict[str, Any] | None]:
+    """
+    Run `requests` and parse each answer. Only the answers that fail parsing or
+    validation are re-asked, once, in a single follow-up round; any still
+    invalid come back as None (and are reported with their `labels`).
+    Invalid answers are kept out of the LLM cache so they are not replayed.
+    """
+    contents = run_requests(requests, accept=_valid_narratives)
+    parsed, failed = [], {}
+    for i, content in enumerate(contents):
+        try:
+            parsed.append(_parse_narratives(content))
+        except ValueError as e:
+            parsed.append(None)
+            failed[i] = _repair_request(requests[i], content, str(e))
+    if failed:
+        print(f"Re-asking {len(failed)} invalid response(s)", flush=True)
+        for i, content in zip(failed, run_requests(list(failed.values()), accept=_valid_narratives)):
+            try:
+                parsed[i] = _parse_narratives(content)
+            except ValueError as e:
+                print(f"⚠️ {labels[i]}: dropping invalid candidate ({e})")
+    return parsed
+
+def _complete_sync(requests: List[Dict[str, Any]], accept=None) -> List[str]:
+    client = clients.openai_client()
+    return [cached_completion(client, accept=accept, **request) for request in requests]
+
+def _gpt_chunk(platform_name: str, posts_chunk: List[Dict[str, Any]], model: str, temp: float) -> Dict[str, Any] | None:
+    return _run_parsed(_complete_sync, [_chunk_request(platform_name, posts_chunk, model, temp)], [platform_name])[0]
+
+def _gpt_merge(platform_name: str, json_a: Dict[str, Any], json_b: Dict[str, Any], model: str, temp: float) -> Dict[str, Any] | None:
+    return _run_parsed(_complete_sync, [_merge_request(platform_name, json_a, json_b, model, temp)], [platform_name])[0]
+
+def _map_reduce(platform_chunks: Dict[str, List[List[Dict[str, Any]]]], model: str, temp: float,
+                run_requests=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Summarize every chunk of every platform concurrently (map), then merge each
+    platform's candidates pairwise in a balanced tree (reduce). Each tree level is
+    one concurrent round across all platforms, so depth is log2(chunks).
+    `run_requests(list of requests, accept=...) -> list of contents` defaults to LLMScheduler().run.
+    """
+    run_requests = run_requests or LLMScheduler().run
+
+    # Map: one request per chunk, all platforms in one round
+    jobs = [(name, chunk) for name, chunks in platform_chunks.items() for chunk in chunks]
+    parsed = _run_parsed(run_requests, [_chunk_request(name, chunk, model, temp) for name, chunk in jobs],
+                         [name for name, _ in jobs])
+    candidates = {name: [] for name in platform_chunks}
+    for (name, _), candidate in zip(jobs, parsed):
+        if candidate is not None:
+            candidates[name].append(candidate)
+
+    # Reduce: pair up candidates level by level; an odd one out moves up as is
+    level = 0
+    while any(len(c) > 1 for c in candidates.values()):
+        level += 1
+        pairs = [
+            (name, c[i], c[i + 1])
+            for name, c in candidates.items()
+            for i in range(0, len(c) - 1, 2)
+        ]
+        print(f"Merge level {level}: {len(pairs)} merge(s)", flush=True)
+        merged = _run_parsed(run_requests, [_merge_request(name, a, b, model, temp) for name, a, b in pairs],
+                             [name for name, _, _ in pairs])
+        next_level = {name: [] for name in candidates}
+        results = iter(zip(pairs, merged))
+        for name, c in candidates.items():
+            for i in range(0, len(c) - 1, 2):
+                (_, a, b), candidate = next(results)
+                # If a merge comes back unusable, carry its first input up instead
+                next_level[name].append(candidate if candidate is not None else a)
+            if len(c) % 2:
+                next_level[name].append(c[-1])
+        candidates = next_level
+
+    return {name: (c[0] if c else {"narratives": []}) for name, c in candidates.items()}
 
 # ---------- Main ----------
 def generate_chunked_summaries(
     INPUT_FILE: str = str(CLEAN_CSV),
     OUTPUT_FILE: str = str(CHUNKS_MD),
     OPENAI_MODEL: str = "gpt-4o-mini",
-    SPLIT_THRESHOLD: int = 30,      # if platform has >30 posts, split into two halves
-    TEMPERATURE: float = 0.3
+    CHUNK_TOKENS: int | None = None,  # post tokens per chunk; defaults to the model's budget
+    TEMPERATURE: float = 0.3,
+    CLUSTER: bool | None = None,  # embed + k-means pre-pass (defaults to SUMMARY_CLUSTERING)
+    BATCH: bool | None = None,  # send each round through the Batch API (defaults to LLM_BATCH_MODE)
 ):
     # Load data
     df = pd.read_csv(INPUT_FILE)
+    Path(OUTPUT_FILE).parent.mkdir(parents=True, exist_ok=True)
 
     # Basic hygiene
     if "cleaned_caption" not in df.columns:
@@ -200,28 +316,34 @@ def generate_chunked_summaries(
     # make them true strings and remove NaNs/<NA>
     df[cols] = df[cols].astype("string").fillna("")
 
+    # Optionally keep only a few representative posts per cluster
+    if USE_CLUSTERING if CLUSTER is None else CLUSTER:
+        df = pd.concat([condense_posts(grp) for _, grp in df.groupby("platform", sort=False)])
+        if "cluster_size" in df.columns:
+            cols = cols + ["cluster_size"]
+
+    # Count each post's tokens once, as formatted for the prompt
+    df = add_token_counts(df, OPENAI_MODEL, format_post=_fmt_post)
+
+    # --- Pack each platform's posts into chunks that fit the model's token budget
+    platform_chunks = {}
+    for platform_name, grp in df.groupby("platform", sort=False):
+        if grp.empty:
+            continue
+        chunks = chunk_frame(grp, OPENAI_MODEL, CHUNK_TOKENS)
+        print(f"{platform_name}: {len(grp)} post(s), {int(grp['n_tokens'].sum())} tokens in {len(chunks)} chunk(s).", flush=True)
+        platform_chunks[platform_name] = [chunk[cols].to_dict(orient="records") for chunk in chunks]
+
+    # --- All platforms in parallel: concurrent chunk summaries, then a tree of merges.
+    # In batch mode every round (chunks, then each merge level) is one Batch API job.
+    runner = BatchRunner() if (USE_BATCH_MODE if BATCH is None else BATCH) else None
+    finals = _map_reduce(platform_chunks, OPENAI_MODEL, TEMPERATURE, run_requests=runner.run if runner else None)
+    if runner:
+        print(f"Batch mode | {runner.format_stats()}", flush=True)
+
     all_sections = []
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        # Process one platform at a time
-        for platform_name, grp in df.groupby("platform", sort=False):
-            posts = grp[["cleaned_caption", "author", "url"]].to_dict(orient="records")
-            n = len(posts)
-            if n == 0:
-                continue
-
-            print(f"{platform_name}: {n} post(s).", flush=True)
-
-            # --- Split logic: only if > SPLIT_THRESHOLD, split into two halves; else one chunk
-            if n > SPLIT_THRESHOLD:
-                mid = (n + 1) // 2  # first half gets the extra if odd
-                chunk_a = posts[:mid]
-                chunk_b = posts[mid:]
-                cand_a = _gpt_chunk(platform_name, chunk_a, OPENAI_MODEL, TEMPERATURE)
-                cand_b = _gpt_chunk(platform_name, chunk_b, OPENAI_MODEL, TEMPERATURE)
-                final_json = _gpt_merge(platform_name, cand_a, cand_b, OPENAI_MODEL, TEMPERATURE)
-            else:
-                final_json = _gpt_chunk(platform_name, posts, OPENAI_MODEL, TEMPERATURE)
-
+        for platform_name, final_json in finals.items():
             section_md = _render_markdown(platform_name, final_json or {"narratives": []})
             # Ensure separation between sections
             if f.tell() > 0:
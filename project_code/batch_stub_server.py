@@ -0,0 +1,178 @@
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ------------------------------------------------------------
+# Local stand-in for the OpenAI Files/Batches API
+# ------------------------------------------------------------
+# Serves just enough of /v1/files, /v1/batches and /v1/chat/completions for
+# the batch mode to be exercised offline with the real openai client:
+#
+#   python -m project_code.batch_stub_server --port 8787
+#   OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=stub LLM_BATCH_MODE=1 python send_mail.py
+#
+# Batches complete `delay` seconds after submission. Each request is answered
+# by `responder(body) -> content`; the default returns a narratives JSON built
+# from the URLs in the prompt, so chunk and merge rounds both have input.
+_URL = re.compile(r"https?://[^\s\"')]+")
+
+def stub_narratives(body: dict) -> str:
+    prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+    urls = list(dict.fromkeys(_URL.findall(prompt)))[:10]
+    return json.dumps({"narratives": [{
+        "name": "Stand-in narrative",
+        "summary": f"Offline stand-in response covering {len(urls)} example post(s).",
+        "examples": [{"handle": "@stub", "excerpt": "stand-in excerpt", "url": u} for u in urls],
+    }]})
+
+
+class StubState:
+    def __init__(self, responder=stub_narratives, delay: float = 0.0):
+        self.responder = responder
+        self.delay = delay
+        self.files = {}    # id -> (filename, purpose, bytes)
+        self.batches = {}  # id -> batch dict
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}-stub{next(self._ids)}"
+
+    def add_file(self, filename: str, purpose: str, data: bytes) -> dict:
+        file_id = self.new_id("file")
+        self.files[file_id] = (filename, purpose, data)
+        return {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+
+    def completion(self, body: dict) -> dict:
+        content = self.responder(body)
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": self.new_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _finish(self, batch: dict):
+        _, _, data = self.files[batch["input_file_id"]]
+        out, failed = [], 0
+        for line in data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            try:
+                response = {"status_code": 200, "request_id": self.new_id("req"), "body": self.completion(item["body"])}
+                out.append({"id": self.new_id("batch_req"), "custom_id": item["custom_id"], "response": response, "error": None})
+            except Exception as e:
+                failed += 1
+                out.append({"id": self.new_id("batch_req"), "custom_id": item["custom_id"], "response": None,
+                            "error": {"code": "stub_error", "message": str(e)}})
+        output = "".join(json.dumps(o) + "\n" for o in out).encode("utf-8")
+        batch["output_file_id"] = self.add_file(f"{batch['id']}_output.jsonl", "batch_output", output)["id"]
+        batch["request_counts"] = {"total": len(out), "completed": len(out) - failed, "failed": failed}
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+    def batch(self, batch_id: str) -> dict | None:
+        batch = self.batches.get(batch_id)
+        if batch and batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.delay:
+            self._finish(batch)
+        return batch
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state: StubState = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload, raw: bool = False):
+        body = payload if raw else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if raw else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._send(404, {"error": {"message": f"No stub route for {self.command} {self.path}", "type": "invalid_request_error"}})
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        m = re.fullmatch(r"/v1/batches/([^/]+)", path)
+        if m:
+            batch = self.state.batch(m.group(1))
+            return self._send(200, batch) if batch else self._not_found()
+        m = re.fullmatch(r"/v1/files/([^/]+)/content", path)
+        if m and m.group(1) in self.state.files:
+            return self._send(200, self.state.files[m.group(1)][2], raw=True)
+        self._not_found()
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        data = self._body()
+        if path == "/v1/chat/completions":
+            return self._send(200, self.state.completion(json.loads(data)))
+        if path == "/v1/files":
+            header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("latin-1")
+            form = BytesParser(policy=HTTP).parsebytes(header + data)
+            fields = {part.get_param("name", header="content-disposition"): part for part in form.iter_parts()}
+            upload = fields["file"]
+            purpose = fields["purpose"].get_payload(decode=True).decode("utf-8")
+            return self._send(200, self.state.add_file(upload.get_filename() or "upload.jsonl", purpose,
+                                                       upload.get_payload(decode=True)))
+        if path == "/v1/batches":
+            params = json.loads(data)
+            if params.get("input_file_id") not in self.state.files:
+                return self._not_found()
+            batch = {
+                "id": self.state.new_id("batch"), "object": "batch", "endpoint": params["endpoint"],
+                "input_file_id": params["input_file_id"], "completion_window": params["completion_window"],
+                "status": "in_progress", "created_at": int(time.time()), "output_file_id": None,
+                "error_file_id": None, "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            self.state.batches[batch["id"]] = batch
+            return self._send(200, self.state.batch(batch["id"]))
+        m = re.fullmatch(r"/v1/batches/([^/]+)/cancel", path)
+        if m and m.group(1) in self.state.batches:
+            batch = self.state.batches[m.group(1)]
+            if batch["status"] not in ("completed", "failed", "expired"):
+                batch["status"] = "cancelled"
+            return self._send(200, batch)
+        self._not_found()
+
+
+def serve(port: int = 0, responder=stub_narratives, delay: float = 0.0, host: str = "127.0.0.1"):
+    """Start the stand-in server on a daemon thread; returns (server, base_url ending in /v1)."""
+    handler = type("StubHandler", (_Handler,), {"state": StubState(responder, delay)})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Files/Batches API")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before a batch completes")
+    args = parser.parse_args()
+    server, base_url = serve(args.port, delay=args.delay)
+    print(f"Stub OpenAI batch server on {base_url}\n  export OPENAI_BASE_URL={base_url} OPENAI_API_KEY=stub LLM_BATCH_MODE=1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
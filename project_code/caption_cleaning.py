@@ -1,20 +1,92 @@
 
-import pandas as pd
+import os
 import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
 from tqdm import tqdm
 
-def clean_captions_file(input_file, output_file, st=None):
-    df = pd.read_csv(input_file)
+# Lowercase, drop everything except word characters, whitespace, # and @,
+# then collapse whitespace runs to one space.
+_NON_WORD = re.compile(r"[^\w\s#@]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Inputs larger than this are streamed in chunks and cleaned on a process pool
+LARGE_FILE_BYTES = int(os.getenv("CLEAN_LARGE_FILE_MB", "100")) * 1024 * 1024
+CHUNK_ROWS = int(os.getenv("CLEAN_CHUNK_ROWS", "100000"))
+CLEAN_WORKERS = int(os.getenv("CLEAN_WORKERS", "0")) or os.cpu_count() or 1
+
+def clean_caption(text):
+    if not isinstance(text, str):
+        return ""
+    text = _NON_WORD.sub("", text.lower())
+    text = _WHITESPACE.sub(" ", text)
+    return text.strip()
+
+def clean_caption_series(captions: pd.Series) -> pd.Series:
+    """Vectorized clean_caption; non-string values (NaN, numbers) become ""."""
+    text = pd.Series(
+        [v if isinstance(v, str) else "" for v in captions], index=captions.index, dtype=object
+    )
+    return (
+        text.str.lower()
+        .str.replace(_NON_WORD, "", regex=True)
+        .str.replace(_WHITESPACE, " ", regex=True)
+        .str.strip()
+    )
 
-    def clean_caption(text):
-        if not isinstance(text, str):
-            return ""
-        text = re.sub(r"[^\w\s#@]", "", text.lower())
-        text = re.sub(r"\s+", " ", text)
-        return text.strip()
+def _clean_values(values: list) -> list:
+    # Process-pool entry point: plain lists pickle cheaply
+    return clean_caption_series(pd.Series(values, dtype=object)).tolist()
 
-    tqdm.pandas()
-    df["cleaned_caption"] = df["caption"].fillna("").progress_apply(clean_caption)
+def _clean_in_chunks(input_file, output_file, chunk_rows, workers):
+    """
+    Stream the CSV `chunk_rows` at a time, cleaning up to 2 x `workers` chunks in
+    parallel and writing them back in input order, so memory stays bounded.
+    With a single worker chunks are cleaned in-process.
+    """
+    pending = deque()
+    header = True
+    with open(output_file, "w", encoding="utf-8-sig", newline="") as out, \
+         (ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext()) as pool, \
+         tqdm(unit="rows", desc="Cleaning captions") as bar:
+
+        def _submit(values):
+            if pool is None:
+                future = Future()
+                future.set_result(_clean_values(values))
+                return future
+            return pool.submit(_clean_values, values)
+
+        def _flush_one():
+            nonlocal header
+            chunk, future = pending.popleft()
+            chunk["cleaned_caption"] = future.result()
+            chunk.to_csv(out, index=False, header=header)
+            header = False
+            bar.update(len(chunk))
+
+        # Text columns are kept as read so every chunk is formatted the same way
+        for chunk in pd.read_csv(input_file, dtype=str, chunksize=chunk_rows):
+            pending.append((chunk, _submit(chunk["caption"].tolist())))
+            if len(pending) >= 2 * workers:
+                _flush_one()
+        while pending:
+            _flush_one()
+
+def clean_captions_file(input_file, output_file, st=None, chunk_rows=None, workers=None):
+    """
+    Add a `cleaned_caption` column. Files over LARGE_FILE_BYTES (or any file when
+    `chunk_rows` is given) are processed in chunks on a pool of `workers` processes.
+    """
+    if chunk_rows or os.path.getsize(input_file) > LARGE_FILE_BYTES:
+        _clean_in_chunks(input_file, output_file, chunk_rows or CHUNK_ROWS, workers or CLEAN_WORKERS)
+        return
+
+    df = pd.read_csv(input_file)
+    df["cleaned_caption"] = clean_caption_series(df["caption"].fillna(""))
     df.to_csv(output_file, index=False, encoding="utf-8-sig")
     # if st:
     #     st.success(f"✅ Cleaned captions saved to {output_file}")
@@ -22,4 +94,4 @@ def clean_captions_file(input_file, output_file, st=None):
 if __name__ == "__main__":
     input_file = "output/forumscout_data_with_captions_2.csv"
     output_file = "output/forumscout_cleaned_data_2.csv"
-    clean_captions_file(input_file, output_file)
\ No newline at end of file
+    clean_captions_file(input_file, output_file)
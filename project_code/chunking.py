@@ -0,0 +1,88 @@
+import math
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+# ------------------------------------------------------------
+# Token-budget chunking
+# ------------------------------------------------------------
+# Posts are packed into prompt chunks by token count rather than by a fixed
+# number of posts. Counts come from tiktoken when it is installed, otherwise
+# from a ~4 characters/token estimate, and are cached on the frame.
+CHUNK_TOKEN_BUDGETS = {
+    "gpt-4o-mini": 8000,
+    "gpt-4o": 8000,
+    "gpt-4": 4000,
+}
+DEFAULT_CHUNK_TOKENS = 6000
+TOKEN_COLUMN = "n_tokens"
+
+def chunk_budget(model: str) -> int:
+    """Post tokens allowed per chunk for `model` (CHUNK_TOKEN_BUDGET overrides)."""
+    override = os.getenv("CHUNK_TOKEN_BUDGET")
+    if override:
+        return int(override)
+    return CHUNK_TOKEN_BUDGETS.get(model, DEFAULT_CHUNK_TOKENS)
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(texts: list, model: str) -> list:
+    """Token count of each string in `texts`."""
+    enc = _encoding(model)
+    if enc is None:
+        return [max(1, len(t) // 4) for t in texts]
+    return [len(tokens) for tokens in enc.encode_ordinary_batch(list(texts))]
+
+def add_token_counts(df: pd.DataFrame, model: str, format_post=None, column: str = TOKEN_COLUMN) -> pd.DataFrame:
+    """
+    Store each post's token count in `column`, counting only rows that don't have
+    one yet. `format_post(record)` gives the text sent to the model (defaults to
+    cleaned_caption).
+    """
+    if column not in df.columns:
+        df[column] = pd.NA
+    missing = df[column].isna()
+    if missing.any():
+        records = df.loc[missing].to_dict(orient="records")
+        texts = [format_post(r) if format_post else str(r.get("cleaned_caption") or "") for r in records]
+        df.loc[missing, column] = count_tokens(texts, model)
+    df[column] = df[column].astype("int64")
+    return df
+
+def pack_chunks(token_counts: list, budget: int) -> list:
+    """
+    Split positions 0..n-1 into consecutive chunks whose token totals stay within
+    `budget`, using as few chunks as possible and spreading tokens evenly
+    between them. A post larger than the budget gets a chunk to itself.
+    """
+    total = sum(token_counts)
+    if not token_counts:
+        return []
+    target = total / max(1, math.ceil(total / budget))
+    chunks, current, used = [], [], 0
+    for i, n in enumerate(token_counts):
+        if current and (used + n > budget or used >= target):
+            chunks.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += n
+    chunks.append(current)
+    return chunks
+
+def chunk_frame(df: pd.DataFrame, model: str, budget: int | None = None, format_post=None) -> list:
+    """Split `df` into token-budgeted chunks (list of DataFrames), counting tokens once."""
+    if df.empty:
+        return []
+    df = add_token_counts(df, model, format_post)
+    positions = pack_chunks(df[TOKEN_COLUMN].tolist(), budget or chunk_budget(model))
+    return [df.iloc[p] for p in positions]
@@ -0,0 +1,54 @@
+import importlib
+import threading
+
+# ------------------------------------------------------------
+# Lazily loaded dependencies and API clients
+# ------------------------------------------------------------
+# Heavy third-party packages (openai, streamlit, instaloader, praw, apify) are
+# imported on first use rather than at module import, and API clients are
+# built on first use and then shared. Importing a pipeline module therefore
+# costs little, never needs an API key, and headless runs never load streamlit.
+# benchmarks/bench_imports.py keeps an eye on this.
+_lock = threading.RLock()
+_env_loaded = False
+_clients = {}
+
+def load_env():
+    """Load .env into os.environ once (no-op if python-dotenv is not installed)."""
+    global _env_loaded
+    with _lock:
+        if _env_loaded:
+            return
+        _env_loaded = True
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            return
+        load_dotenv()
+
+def lazy_import(name: str):
+    """Import and return module `name` (cached by Python after the first call)."""
+    return importlib.import_module(name)
+
+def shared(name: str, factory):
+    """The process-wide client `name`, built by `factory()` on first use."""
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+def openai_client():
+    """Shared synchronous OpenAI client (reads OPENAI_API_KEY / OPENAI_BASE_URL on first use)."""
+    def _make():
+        load_env()
+        return lazy_import("openai").OpenAI()
+    return shared("openai", _make)
+
+def async_openai_client(**kwargs):
+    """A new AsyncOpenAI client; async clients are tied to one event loop, so they are not shared."""
+    load_env()
+    return lazy_import("openai").AsyncOpenAI(**kwargs)
+
+def streamlit():
+    """The streamlit module, imported only when something actually draws UI."""
+    return lazy_import("streamlit")
@@ -0,0 +1,107 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from project_code.embedding_store import EmbeddingStore
+from project_code.embeddings import embed_texts
+
+# ------------------------------------------------------------
+# Cluster pre-pass
+# ------------------------------------------------------------
+# Optionally condense posts before summarization: embed the cleaned captions
+# (reusing vectors from the embedding store), k-means them on the unit sphere
+# and keep only the few posts closest to each centroid, annotated with the
+# size of their cluster. Prompt size then grows
+# with the number of narratives rather than the number of posts.
+USE_CLUSTERING = os.getenv("SUMMARY_CLUSTERING", "0") == "1"
+MAX_CLUSTERS = int(os.getenv("SUMMARY_MAX_CLUSTERS", "40"))
+REPRESENTATIVES_PER_CLUSTER = int(os.getenv("SUMMARY_REPRESENTATIVES", "3"))
+MIN_POSTS_TO_CLUSTER = 50
+
+CLUSTER_NOTE = (
+    "Posts marked [N similar posts] each stand for a cluster of N similar posts; "
+    "weigh narratives by these cluster sizes."
+)
+
+def cluster_note(post: dict) -> str:
+    """' [N similar posts]' for a representative post, else ''."""
+    size = post.get("cluster_size")
+    if size is None or pd.isna(size) or int(size) <= 1:
+        return ""
+    return f" [{int(size)} similar posts]"
+
+def choose_k(n: int, max_clusters: int = MAX_CLUSTERS) -> int:
+    """Rule-of-thumb cluster count, sqrt(n / 2), capped at `max_clusters`."""
+    return max(1, min(max_clusters, round(math.sqrt(n / 2))))
+
+def kmeans(X: np.ndarray, k: int, iters: int = 30, seed: int = 0):
+    """
+    Spherical k-means on L2-normalized rows of X (float32), k-means++ seeding.
+    Returns (labels, centroids).
+    """
+    n = len(X)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    centers = [int(rng.integers(n))]
+    dist = 1.0 - X @ X[centers[0]]
+    for _ in range(1, k):
+        weights = np.clip(dist, 0, None)
+        total = weights.sum()
+        nxt = int(rng.choice(n, p=weights / total)) if total > 0 else int(rng.integers(n))
+        centers.append(nxt)
+        dist = np.minimum(dist, 1.0 - X @ X[nxt])
+    C = X[centers].copy()
+
+    labels = np.full(n, -1)
+    for _ in range(iters):
+        new_labels = np.argmax(X @ C.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(C)
+        np.add.at(sums, labels, X)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        filled = norms[:, 0] > 0
+        C[filled] = sums[filled] / norms[filled]  # empty clusters keep their centroid
+    return labels, C
+
+def representatives(X: np.ndarray, labels: np.ndarray, C: np.ndarray, per_cluster: int) -> list:
+    """[(cluster size, [row positions closest to the centroid])], largest cluster first."""
+    out = []
+    for c in range(len(C)):
+        members = np.flatnonzero(labels == c)
+        if len(members) == 0:
+            continue
+        order = np.argsort(-(X[members] @ C[c]))[:per_cluster]
+        out.append((len(members), members[order].tolist()))
+    out.sort(key=lambda item: -item[0])
+    return out
+
+def condense_posts(df: pd.DataFrame, text_col: str = "cleaned_caption",
+                   max_clusters: int = MAX_CLUSTERS, per_cluster: int = REPRESENTATIVES_PER_CLUSTER,
+                   embed_batch=None) -> pd.DataFrame:
+    """
+    Replace `df` with a few representative posts per cluster, adding a
+    `cluster_size` column. Small frames are returned unchanged.
+    """
+    if len(df) < MIN_POSTS_TO_CLUSTER:
+        return df
+    # Posts with a URL go through the persistent store, so weekly runs reuse their vectors
+    if "url" in df.columns:
+        X = EmbeddingStore().ensure(df, text_col=text_col, embed_batch=embed_batch)
+    else:
+        X = embed_texts(df[text_col].astype(str).tolist(), embed_batch=embed_batch)
+    labels, C = kmeans(X, choose_k(len(df), max_clusters))
+    picks = representatives(X, labels, C, per_cluster)
+
+    rows, sizes = [], []
+    for size, positions in picks:
+        rows.extend(positions)
+        sizes.extend([size] * len(positions))
+    out = df.iloc[rows].copy()
+    out["cluster_size"] = sizes
+    print(f"Clustering: {len(df)} posts -> {len(picks)} clusters, {len(out)} representatives")
+    return out
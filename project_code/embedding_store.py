@@ -0,0 +1,219 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from project_code.embeddings import EMBEDDING_MODEL, embed_texts
+from project_code.enrichment_cache import canonical_url
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "output"
+
+# ------------------------------------------------------------
+# Post embedding store
+# ------------------------------------------------------------
+# One float32 row per post in a raw file that is only ever appended to and is
+# read through np.memmap, plus an append-only JSONL index of post id -> row.
+# A post id is the canonical URL plus a hash of the cleaned caption, so an
+# edited caption gets a new row. Rows are L2-normalized, so dot product is
+# cosine similarity.
+#   output/cache/embedding_store/{meta.json, vectors.f32, index.jsonl}
+STORE_DIR = OUTPUT_DIR / "cache" / "embedding_store"
+QUERY_BLOCK_ROWS = 65536
+
+def post_id(url: str, caption: str) -> str:
+    digest = hashlib.sha256((caption or "").encode("utf-8")).hexdigest()[:16]
+    return f"{canonical_url(url)}#{digest}"
+
+def _write_at(path: Path, offset: int, payload: bytes):
+    """Write `payload` at `offset`, discarding anything past it (leftovers of an interrupted write)."""
+    with open(path, "r+b" if path.exists() else "wb") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(payload)
+
+def _normalize(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.where(norms == 0, 1, norms)
+
+
+class EmbeddingStore:
+    """Append-only, memory-mapped store of post embeddings with cosine top-k search."""
+
+    def __init__(self, path=None, model: str = EMBEDDING_MODEL):
+        self.path = Path(path or STORE_DIR)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._meta_path = self.path / "meta.json"
+        self._vectors_path = self.path / "vectors.f32"
+        self._index_path = self.path / "index.jsonl"
+        self._lock = threading.Lock()
+        self._mmap = None
+
+        meta = json.loads(self._meta_path.read_text(encoding="utf-8")) if self._meta_path.exists() else {}
+        if meta and meta.get("model") != model:
+            raise ValueError(f"Embedding store at {self.path} holds {meta.get('model')} vectors, not {model}")
+        self.model = model
+        self.dim = meta.get("dim")
+
+        self.ids = []
+        self._rows = {}
+        self._index_bytes = 0
+        self._load_index()
+        self._recover()
+
+    def _load_index(self):
+        if not self._index_path.exists():
+            return
+        with open(self._index_path, "rb") as f:
+            for raw in f:
+                # A line without its newline is a torn write; it and anything after are dropped
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    pid = json.loads(raw)["id"] if raw.strip() else None
+                except (ValueError, KeyError):
+                    break
+                self._index_bytes += len(raw)
+                if pid is not None:
+                    self._rows[pid] = len(self.ids)
+                    self.ids.append(pid)
+        if self._index_bytes != self._index_path.stat().st_size:
+            with open(self._index_path, "r+b") as f:
+                f.truncate(self._index_bytes)
+
+    def _recover(self):
+        """
+        Make vectors.f32 hold exactly one row per index line. add() writes vectors
+        before index lines, so an interrupted run leaves orphan (or torn) vectors
+        past the last indexed row; they are cut off so the next append lines up.
+        Index lines without a vector (not produced by add()) are dropped.
+        """
+        if not self.dim:
+            return
+        row_bytes = 4 * self.dim
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        on_disk = size // row_bytes
+        if on_disk < len(self.ids):
+            for stale in self.ids[on_disk:]:
+                del self._rows[stale]
+            self.ids = self.ids[:on_disk]
+            payload = "".join(json.dumps({"id": pid}) + "\n" for pid in self.ids).encode("utf-8")
+            _write_at(self._index_path, 0, payload)
+            self._index_bytes = len(payload)
+        if size != len(self.ids) * row_bytes:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(len(self.ids) * row_bytes)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, pid):
+        return pid in self._rows
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Read-only (n, dim) memmap over the stored vectors."""
+        with self._lock:
+            n = len(self.ids)
+            if not n:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            if self._mmap is None or len(self._mmap) != n:
+                self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+            return self._mmap
+
+    def rows(self, ids) -> list:
+        return [self._rows.get(pid) for pid in ids]
+
+    def get(self, ids) -> np.ndarray:
+        """Vectors for `ids` (all must be present), as an in-memory array."""
+        rows = self.rows(ids)
+        missing = [pid for pid, row in zip(ids, rows) if row is None]
+        if missing:
+            raise KeyError(f"{len(missing)} id(s) not in the embedding store, e.g. {missing[0]}")
+        return np.asarray(self.vectors[rows])
+
+    def add(self, ids, vectors) -> int:
+        """Append vectors for ids not stored yet; returns how many were added."""
+        X = _normalize(vectors)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(X.shape[1])
+                self._meta_path.write_text(json.dumps({"model": self.model, "dim": self.dim}), encoding="utf-8")
+            elif X.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dim vectors, got {X.shape[1]}")
+
+            new, seen = [], set()
+            for i, pid in enumerate(ids):
+                if pid not in self._rows and pid not in seen:
+                    new.append(i)
+                    seen.add(pid)
+            if not new:
+                return 0
+            # Vectors first, then the index, so a crash never indexes a missing row.
+            # Both are written at the end of the last complete append, so leftovers
+            # of an earlier interrupted add() are overwritten rather than indexed.
+            self._mmap = None
+            _write_at(self._vectors_path, len(self.ids) * 4 * self.dim, X[new].tobytes())
+            payload = "".join(json.dumps({"id": ids[i]}) + "\n" for i in new).encode("utf-8")
+            _write_at(self._index_path, self._index_bytes, payload)
+            self._index_bytes += len(payload)
+            for i in new:
+                self._rows[ids[i]] = len(self.ids)
+                self.ids.append(ids[i])
+        return len(new)
+
+    def ensure(self, df: pd.DataFrame, text_col: str = "cleaned_caption", url_col: str = "url",
+               embed_batch=None) -> np.ndarray:
+        """Embed the posts of `df` that are not stored yet, then return all their vectors in order."""
+        captions = df[text_col].fillna("").astype(str).tolist()
+        ids = [post_id(u, c) for u, c in zip(df[url_col].fillna("").astype(str), captions)]
+        todo = [i for i, pid in enumerate(ids) if pid not in self._rows]
+        if todo:
+            vectors = embed_texts([captions[i] for i in todo], model=self.model, embed_batch=embed_batch)
+            self.add([ids[i] for i in todo], vectors)
+        print(f"Embedding store: {len(ids)} post(s), {len(todo)} new, {len(self)} stored")
+        return self.get(ids)
+
+    def top_k(self, queries, k: int = 10, exclude_rows=None):
+        """
+        Cosine top-k over the whole store for each query vector, scanning the
+        memmap in blocks. Returns (rows, scores), each (n_queries, k), best first.
+        `exclude_rows[i]` (e.g. the query's own row) is left out of query i's results.
+        """
+        Q = _normalize(np.atleast_2d(queries))
+        V = self.vectors
+        n = len(V)
+        if n == 0:
+            return np.zeros((len(Q), 0), dtype=np.int64), np.zeros((len(Q), 0), dtype=np.float32)
+        want = min(k + (1 if exclude_rows is not None else 0), n)
+        best_rows = np.zeros((len(Q), 0), dtype=np.int64)
+        best_scores = np.zeros((len(Q), 0), dtype=np.float32)
+        for start in range(0, n, QUERY_BLOCK_ROWS):
+            S = Q @ np.asarray(V[start:start + QUERY_BLOCK_ROWS]).T
+            take = min(want, S.shape[1])
+            idx = np.argpartition(-S, take - 1, axis=1)[:, :take]
+            rows = np.concatenate([best_rows, idx + start], axis=1)
+            scores = np.concatenate([best_scores, np.take_along_axis(S, idx, axis=1)], axis=1)
+            keep = np.argpartition(-scores, min(want, scores.shape[1]) - 1, axis=1)[:, :want]
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        if exclude_rows is not None:
+            keep = best_rows != np.asarray(exclude_rows).reshape(-1, 1)
+            # Every row drops at most one entry; trim all rows to the same width
+            width = min(k, int(keep.sum(axis=1).min()))
+            best_rows = np.stack([r[m][:width] for r, m in zip(best_rows, keep)])
+            best_scores = np.stack([s[m][:width] for s, m in zip(best_scores, keep)])
+        return best_rows, best_scores
+
+    def similar(self, ids, k: int = 10) -> list:
+        """For each stored post id, its k most similar other posts as [(id, score)]."""
+        rows, scores = self.top_k(self.get(ids), k=k, exclude_rows=self.rows(ids))
+        return [[(self.ids[r], float(s)) for r, s in zip(rr, ss)] for rr, ss in zip(rows, scores)]
@@ -0,0 +1,76 @@
+import base64
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from project_code import clients
+from project_code.disk_cache import DiskCache
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "output"
+
+# ------------------------------------------------------------
+# Caption embeddings
+# ------------------------------------------------------------
+# Captions are embedded in batches and each vector is cached on disk under a
+# hash of (model, caption), so a caption is only ever embedded once.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH = 256
+EMBEDDING_CACHE_PATH = OUTPUT_DIR / "cache" / "embeddings.sqlite"
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+_cache = None
+_lock = threading.Lock()
+
+def _get_cache():
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = DiskCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+        return _cache
+
+def text_hash(text: str, model: str = EMBEDDING_MODEL) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+def _encode(vector: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+def _decode(payload: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload), dtype=np.float32)
+
+def embed_texts(texts: list, model: str = EMBEDDING_MODEL, embed_batch=None) -> np.ndarray:
+    """
+    Return an (n, dim) float32 matrix of L2-normalized embeddings for `texts`.
+    Cached vectors are reused; the rest are embedded EMBEDDING_BATCH at a time.
+    `embed_batch(list of str) -> list of vectors` overrides the OpenAI call.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    cache = _get_cache()
+    keys = [text_hash(t, model) for t in texts]
+    vectors = {}
+    for key in dict.fromkeys(keys):
+        cached = cache.get(key)
+        if cached is not None:
+            vectors[key] = _decode(cached)
+
+    todo = {key: text for key, text in zip(keys, texts) if key not in vectors}
+    if todo:
+        if embed_batch is None:
+            def embed_batch(batch):
+                resp = clients.openai_client().embeddings.create(model=model, input=batch)
+                return [d.embedding for d in resp.data]
+        pending = list(todo.items())
+        for i in range(0, len(pending), EMBEDDING_BATCH):
+            batch = pending[i:i + EMBEDDING_BATCH]
+            for (key, _), vector in zip(batch, embed_batch([text for _, text in batch])):
+                vectors[key] = np.asarray(vector, dtype=np.float32)
+            cache.set_many((key, _encode(vectors[key])) for key, _ in batch)
+    print(f"Embeddings: {len(texts)} text(s), {len(todo)} embedded, {len(texts) - len(todo)} from cache")
+
+    matrix = np.stack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
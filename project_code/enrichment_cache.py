@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from project_code.disk_cache import DiskCache
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "output"
+
+# ------------------------------------------------------------
+# Caption enrichment cache
+# ------------------------------------------------------------
+# Captions fetched from Instagram, YouTube and Reddit are kept on disk keyed
+# on the canonical post URL, so posts that reappear week after week are not
+# fetched again. Posts that could not be found are cached too ("missing"),
+# but only for NEGATIVE_TTL.
+USE_ENRICH_CACHE = os.getenv("ENRICH_CACHE", "1") != "0"
+ENRICH_CACHE_PATH = OUTPUT_DIR / "cache" / "enrichment.sqlite"
+ENRICH_CACHE_MAX_ENTRIES = int(os.getenv("ENRICH_CACHE_MAX_ENTRIES", "50000"))
+DAY = 24 * 60 * 60
+DEFAULT_TTL = 7 * DAY
+PLATFORM_TTLS = {
+    "instagram": 30 * DAY,      # captions rarely change
+    "youtube": 1 * DAY,         # title/description are stable, view counts are not
+    "reddit_posts": 7 * DAY,
+    "reddit_comments": 7 * DAY,
+}
+NEGATIVE_TTL = int(os.getenv("ENRICH_NEGATIVE_TTL", str(DAY)))
+
+_YOUTUBE_ID = re.compile(r"(?:v=|youtu\.be/|/shorts/)([A-Za-z0-9_-]{11})")
+_INSTAGRAM_POST = re.compile(r"/(p|reel|tv)/([A-Za-z0-9_-]+)")
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a post URL so the same post always maps to one key: lowercase host
+    without www./m./old., no query string, fragment or trailing slash. YouTube
+    and Instagram URLs collapse to their video ID / shortcode.
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    m = _YOUTUBE_ID.search(url)
+    if m and "youtu" in url:
+        return f"https://www.youtube.com/watch?v={m.group(1)}"
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m.", "old."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if host.endswith("instagram.com"):
+        m = _INSTAGRAM_POST.search(parts.path)
+        if m:
+            return f"https://instagram.com/p/{m.group(2)}"
+    path = parts.path
+    if path.endswith(".json"):
+        path = path[: -len(".json")]
+    path = path.rstrip("/")
+    return f"https://{host}{path}"
+
+
+class EnrichmentCache:
+    """
+    URL -> {caption, body, author, fetched_at, missing, ...} on top of DiskCache,
+    with per-platform TTLs and hit/miss counters.
+    """
+
+    def __init__(self, path=ENRICH_CACHE_PATH, max_entries: int = ENRICH_CACHE_MAX_ENTRIES):
+        self._cache = DiskCache(path, max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, platform: str, outcome: str):
+        with self._lock:
+            stats = self._stats.setdefault(platform, {"hits": 0, "misses": 0, "negative_hits": 0})
+            stats[outcome] += 1
+
+    def lookup(self, platform: str, url: str) -> dict | None:
+        """The cached entry for `url`, or None if absent, expired, or a stale negative entry."""
+        key = canonical_url(url)
+        if not key:
+            return None
+        entry = self._cache.get(key, ttl=PLATFORM_TTLS.get(platform, DEFAULT_TTL))
+        if entry is not None and entry.get("missing") and time.time() - entry.get("fetched_at", 0) > NEGATIVE_TTL:
+            entry = None
+        if entry is None:
+            self._count(platform, "misses")
+        else:
+            self._count(platform, "negative_hits" if entry.get("missing") else "hits")
+        return entry
+
+    def store(self, platform: str, url: str, entry: dict):
+        key = canonical_url(url)
+        if not key:
+            return
+        value = {"caption": "", "body": "", "author": "", "missing": False, **entry}
+        value["fetched_at"] = time.time()
+        self._cache.set(key, value)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {platform: dict(s) for platform, s in self._stats.items()}
+
+    def format_stats(self) -> list[str]:
+        """One line per platform: hits, negative hits, misses and hit rate."""
+        lines = []
+        for platform, s in sorted(self.stats().items()):
+            total = s["hits"] + s["negative_hits"] + s["misses"]
+            rate = (s["hits"] + s["negative_hits"]) / total if total else 0.0
+            lines.append(
+                f"{platform}: hits={s['hits']} negative_hits={s['negative_hits']} "
+                f"misses={s['misses']} hit_rate={rate:.0%}"
+            )
+        return lines
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_enrichment_cache() -> EnrichmentCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EnrichmentCache(ENRICH_CACHE_PATH)
+        return _cache
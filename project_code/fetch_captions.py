@@ -1,18 +1,18 @@
-import instaloader
-import csv
 import re
 import os
-import streamlit as st
-import yt_dlp
-import requests
-from bs4 import BeautifulSoup
+import pandas as pd
+from project_code import clients, http_client, youtube_api
 # import snscrape.modules.twitter as sntwitter
 from utils.logger import log_to_browser
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # go up to project root
 OUTPUT_DIR = BASE_DIR / "output"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+YOUTUBE_STAT_FIELDS = ["view_count", "like_count", "comment_count"]
+
+# Platforms whose caption ForumScout already put in `content` (tiktok only needs content)
+PASS_THROUGH_PLATFORMS = ["instagram", "reddit_posts", "reddit_comments", "twitter"]
 
 # For Instaloader, need to extract shortcode from URL
 def extract_shortcode(url):
@@ -22,7 +22,7 @@ def extract_shortcode(url):
 def fetch_instagram_captions(shortcode, loader):
     try:
         # log_to_browser(f"Fetching Instagram caption for {shortcode}")
-        post = instaloader.Post.from_shortcode(loader.context, shortcode)
+        post = clients.lazy_import("instaloader").Post.from_shortcode(loader.context, shortcode)
         return post.caption
     except Exception as e:
         print(f"Error fetching caption for {shortcode}: {e}")
@@ -31,35 +31,21 @@ def fetch_instagram_captions(shortcode, loader):
 # Using YouTube API Key
 def fetch_youtube_title(video_url: str) -> str | None:
     """Fetch a YouTube video title via YouTube Data API v3."""
-    api_key = os.getenv("YOUTUBE_API_KEY")
-    if not api_key:
+    if not os.getenv("YOUTUBE_API_KEY"):
         print("❌ YOUTUBE_API_KEY not set — skipping YouTube title fetch")
         return None
 
     # Extract video ID from the URL
-    match = re.search(r"(?:v=|youtu\.be/)([A-Za-z0-9_-]{11})", video_url)
-    if not match:
+    video_id = youtube_api.extract_video_id(video_url)
+    if not video_id:
         print(f"❌ Invalid YouTube URL: {video_url}")
         return None
-    video_id = match.group(1)
 
-    # Call the API
-    url = (
-        f"https://www.googleapis.com/youtube/v3/videos"
-        f"?part=snippet&id={video_id}&key={api_key}"
-    )
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        items = data.get("items", [])
-        if not items:
-            print(f"⚠️ No video found for ID {video_id}")
-            return None
-        return items[0]["snippet"]["title"]
-    except Exception as e:
-        print(f"❌ Failed to fetch YouTube title: {e}")
+    info = youtube_api.fetch_videos([video_id]).get(video_id)
+    if not info:
+        print(f"⚠️ No video found for ID {video_id}")
         return None
+    return info["title"]
 
 
 def fetch_reddit_post(url):
@@ -68,7 +54,8 @@ def fetch_reddit_post(url):
     headers = {'User-Agent': 'trend-monitor/0.1'}
     try:
         # log_to_browser(f"Fetching Reddit post for {url}")
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
+        response.raise_for_status()
         data = response.json()
         post = data[0]['data']['children'][0]['data']
         title = post.get('title', '')
@@ -84,7 +71,8 @@ def fetch_reddit_comment(url):
     headers = {'User-Agent': 'trend-monitor/0.1'}
     try: 
         # log_to_browser(f"Fetching Reddit comment from {url}")
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
+        response.raise_for_status()
         data = response.json()
 
         # The comment is in the second object (index 1), under "children"
@@ -108,62 +96,60 @@ def fetch_reddit_comment(url):
 #     print('tweet id', tweet_id)
 
 def enrich_captions(input_file, output_file):
+    """
+    Add caption/body (and YouTube stats) columns. Platforms whose caption is already
+    in `content` are filled in one columnar pass; only YouTube rows need a lookup,
+    resolved 50 IDs per videos.list call.
+    """
     print(f"Enriching captions from {input_file} to {output_file}")
     # log_to_browser(f"Enriching captions from {input_file} to {output_file}")
 
-    # Initialize Instaloader only once
-    L = instaloader.Instaloader()
-
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"Input file not found: {input_file}")
 
-    # 🔁 First pass: count total rows
-    with open(input_file, newline='', encoding='utf-8') as f:
-        total = sum(1 for _ in csv.DictReader(f))
-
-    # Second pass: use total number of rows
-    with open(input_file, newline='', encoding='utf-8') as infile, open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        reader = csv.DictReader(infile)
-        # reader_list = list(csv.DictReader(infile))
-        fieldnames = reader.fieldnames + ["caption"] + ["body"]
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        # rows = list(reader)
-        # total = len(rows)
-
+    # Read everything as text so values are written back exactly as they came in
+    df = pd.read_csv(input_file, dtype=str, keep_default_na=False)
+    for col in ("platform", "url", "content"):
+        if col not in df.columns:
+            df[col] = ""
+    fieldnames = list(dict.fromkeys(list(df.columns) + ["caption", "body"] + YOUTUBE_STAT_FIELDS))
+    df = df.reindex(columns=fieldnames, fill_value="")
+
+    platform, has_url, content = df["platform"], df["url"].ne(""), df["content"]
+    pass_through = (platform.isin(PASS_THROUGH_PLATFORMS) & has_url) | (platform.eq("tiktok") & content.ne(""))
+    df["caption"] = content.where(pass_through, "")
+    df["body"] = ""
+    for field in YOUTUBE_STAT_FIELDS:
+        df[field] = ""
+
+    # Only YouTube rows need a remote lookup
+    youtube_idx = df.index[platform.eq("youtube") & has_url]
+    total = len(youtube_idx)
+    if total:
         progress_text = "Scraping captions now. Please be patient."
-        progress_bar = st.progress(0, text=progress_text)
-
-        for i, row in enumerate(reader):
-            if row["platform"] == "instagram" and row["url"]:
-                # shortcode = extract_shortcode(row["url"])
-                # row["caption"] = fetch_instagram_captions(shortcode, L) if shortcode else ""
-                row["caption"] = row["content"]
-            elif row["platform"] == "youtube" and row["url"]:
-              row["caption"] = fetch_youtube_title(row["url"])
-            elif row["platform"] == "reddit_posts" and row["url"]:
-                # title, body = fetch_reddit_post(row["url"])
-                # row["caption"] = title
-                # row["body"] = body
-                row["caption"] = row["content"]
-            elif row["platform"] == "reddit_comments" and row["url"]:
-                # comment_text, author = fetch_reddit_comment(row["url"])
-                # row["author"] = author
-                # row["caption"] = comment_text
-                row["caption"] = row["content"]
-            elif row["platform"] == "twitter" and row["url"]:
-                row["caption"] = row["content"]
-            elif row["platform"] == "tiktok" and row["content"]:
-                row["caption"] = row["content"]
-            else:
-                row["caption"] = ""
-            writer.writerow(row)
-
-            progress_bar.progress((i + 1) / total, text=f"Processing {i+1} of {total}")
+        progress_bar = clients.streamlit().progress(0, text=progress_text)
+
+        def update_progress(done, n_videos):
+            # Once per finished videos.list batch (50 IDs), so no extra throttling
+            progress_bar.progress(done / n_videos, text=f"Looked up {done} of {n_videos} videos")
+
+        video_ids = df.loc[youtube_idx, "url"].map(youtube_api.extract_video_id)
+        videos = youtube_api.fetch_videos(video_ids.tolist(), on_progress=update_progress)
+        # Title, description and statistics all come from the same batched call;
+        # fill each column in one assignment (cell-by-cell writes are slow)
+        info = video_ids.map(lambda video_id: videos.get(video_id) or {})
+        df.loc[youtube_idx, "caption"] = info.map(lambda i: i.get("title") or "")
+        df.loc[youtube_idx, "body"] = info.map(lambda i: i.get("description") or "")
+        for field in YOUTUBE_STAT_FIELDS:
+            df.loc[youtube_idx, field] = info.map(lambda i, field=field: i.get(field) or "")
 
         progress_bar.empty()
-        # log_to_browser("Caption enrichment complete!")
-        print(f"✅ Captions added. Enriched data saved to {output_file}")
+
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(output_file, index=False, encoding="utf-8", lineterminator="\r\n")
+    # log_to_browser("Caption enrichment complete!")
+    print(f"✅ Captions added ({len(df) - total} passed through, {total} looked up). "
+          f"Enriched data saved to {output_file}")
 
 if __name__ == "__main__":
     enrich_captions("output/forumscout_data.csv", "output/forumscout_data_with_captions.csv")
@@ -1,6 +1,12 @@
-from apify_client import ApifyClient
 import csv
+import os
+import re
+import threading
+import pandas as pd
+from project_code import clients
 from utils.logger import log_to_browser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 
@@ -9,60 +15,208 @@ OUTPUT_DIR = BASE_DIR / "output"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 TIKTOK_CSV = OUTPUT_DIR / "tiktok_data.csv"
 
-def scrape_tiktok_data(apify_token, keywords: list, sort_by="latest", recency=None, output_file = str(TIKTOK_CSV)):
+FIELDNAMES = [
+    "platform", "keyword", "content", "author", "timestamp", "url",
+    "digg_count", "share_count", "play_count", "comment_count",
+]
+ACTOR_ID = "clockworks/tiktok-scraper"
+
+# How many actor runs may be in flight at once, and how many hashtags go into one run
+MAX_PARALLEL_RUNS = int(os.getenv("TIKTOK_MAX_PARALLEL_RUNS", "5"))
+HASHTAGS_PER_RUN = int(os.getenv("TIKTOK_HASHTAGS_PER_RUN", "1"))
+MAX_ITEMS_PER_KEYWORD = int(os.getenv("TIKTOK_MAX_ITEMS_PER_KEYWORD", "0")) or None
+
+# Only these (flattened) dataset fields are downloaded, a page at a time
+ITEM_FIELDS = [
+    "text", "createTimeISO", "webVideoUrl",
+    "authorMeta.name", "authorMeta.uniqueId", "authorMeta.nickName",
+    "diggCount", "shareCount", "playCount", "commentCount",
+    "searchHashtag.name",
+]
+FLATTEN_FIELDS = ["authorMeta", "searchHashtag"]
+PAGE_SIZE = 100
+DEFAULT_RESULTS_PER_HASHTAG = 25
+
+def _hashtag_key(text: str) -> str:
+  return re.sub(r"[^\w]", "", (text or "").lower())
+
+def _dataset_id(run):
+  # apify-client < 3 returns dicts, >= 3 returns models
+  if isinstance(run, dict):
+    return run["defaultDatasetId"]
+  return run.default_dataset_id
+
+def _get(item, dotted):
+  # Items are flattened ("authorMeta.name"), but accept nested dicts too
+  if dotted in item:
+    return item[dotted]
+  head, _, tail = dotted.partition(".")
+  return (item.get(head) or {}).get(tail) if tail else item.get(head)
+
+def _item_keyword(item, batch):
+  """
+  Attribute an item to the keyword whose hashtag produced it. Items whose
+  hashtag matches none of the batch go to the batch's first keyword, so they
+  still count against a real keyword's item cap and `since` cutoff.
+  """
+  if len(batch) == 1:
+    return batch[0]
+  tag = _hashtag_key(_get(item, "searchHashtag.name") or "")
+  for keyword in batch:
+    if _hashtag_key(keyword) == tag:
+      return keyword
+  return batch[0]
+
+def _item_to_row(item, keyword):
+  author = (
+      _get(item, "authorMeta.name") or          # handle/username
+      _get(item, "authorMeta.uniqueId") or      # sometimes used
+      _get(item, "authorMeta.nickName") or ""   # display name fallback
+  )
+  return {
+      "platform": "tiktok",
+      "keyword": keyword,
+      "content": item.get("text", ""),  # video description/caption
+      "author": author,
+      "timestamp": item.get("createTimeISO", ""),  # ISO timestamp
+      "url": item.get("webVideoUrl", ""),  # video URL
+      "digg_count": item.get("diggCount"),
+      "share_count": item.get("shareCount"),
+      "play_count": item.get("playCount"),
+      "comment_count": item.get("commentCount"),
+  }
+
+def _cutoff_for(since, keyword):
+  value = since.get(keyword) if isinstance(since, dict) else since
+  if value is None:
+    return None
+  ts = pd.Timestamp(value)
+  return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def _is_older(row, cutoff):
+  if cutoff is None:
+    return False
+  ts = pd.to_datetime(row["timestamp"], utc=True, errors="coerce")
+  return pd.notna(ts) and ts <= cutoff
+
+def _run_batch(client, batch, sort_by, max_items=None, since=None, on_rows=None):
+  """
+  Run the actor for one batch of hashtags, then page through its dataset with
+  a field projection. Pages are handed to `on_rows` as they arrive; paging stops
+  once every keyword hit `max_items` or, for a newest-first ("latest") listing,
+  a whole page is older than `since`. Other sort orders can still hold recent
+  items on later pages, so they only drop the old items.
+  """
+  print(f"🔎 Fetching {batch} from TikTok based on {sort_by}...")
+  run_input = {
+      "hashtags": list(batch),
+      "resultsPerPage": max_items or DEFAULT_RESULTS_PER_HASHTAG,
+      "profileSorting": sort_by,
+      "proxyCountryCode": "None",
+  }
+  # Run the Actor and wait for it to finish
+  run = client.actor(ACTOR_ID).call(run_input=run_input)
+  dataset = client.dataset(_dataset_id(run))
+
+  counts = {keyword: 0 for keyword in batch}
+  cutoffs = {keyword: _cutoff_for(since, keyword) for keyword in batch}
+  rows, offset = [], 0
+  while True:
+    items = dataset.list_items(
+        offset=offset, limit=PAGE_SIZE, fields=ITEM_FIELDS, flatten=FLATTEN_FIELDS
+    ).items
+    offset += len(items)
+
+    page_rows, page_had_recent = [], False
+    for item in items:
+      keyword = _item_keyword(item, batch)
+      row = _item_to_row(item, keyword)
+      if _is_older(row, cutoffs[keyword]):
+        continue
+      page_had_recent = True
+      if max_items and counts[keyword] >= max_items:
+        continue
+      counts[keyword] += 1
+      page_rows.append(row)
+
+    rows.extend(page_rows)
+    if on_rows and page_rows:
+      on_rows(page_rows)
+
+    if len(items) < PAGE_SIZE:
+      break
+    if max_items and all(c >= max_items for c in counts.values()):
+      print(f"   {batch}: item cap of {max_items} reached at offset {offset}")
+      break
+    if since is not None and sort_by == "latest" and not page_had_recent:
+      print(f"   {batch}: reached items older than cutoff at offset {offset}")
+      break
+  return rows
+
+def scrape_tiktok_data(
+    apify_token,
+    keywords: list,
+    sort_by="latest",
+    recency=None,
+    output_file=None,
+    max_parallel_runs: int = MAX_PARALLEL_RUNS,
+    hashtags_per_run: int = HASHTAGS_PER_RUN,
+    max_items_per_keyword: int | None = MAX_ITEMS_PER_KEYWORD,
+    since=None,
+):
+  """
+  Scrape TikTok hashtags with Apify and return the normalized rows.
+  Keywords are grouped `hashtags_per_run` to an actor run and up to
+  `max_parallel_runs` runs execute at once. `output_file` optionally exports
+  the rows to CSV (e.g. str(TIKTOK_CSV)), a page at a time as they arrive.
+  Rows are returned in keyword order.
+
+  Each dataset is paged with a field projection; `max_items_per_keyword`
+  caps items per keyword and `since` (a datetime, or a dict keyword -> datetime)
+  drops older items and stops paging once a whole page is older.
+  """
   # Initialize the ApifyClient with your API token
-  client = ApifyClient(apify_token)
+  client = clients.lazy_import("apify_client").ApifyClient(apify_token)
 
   if sort_by == 'Most Popular':
      sort_by = 'popular'
+  if isinstance(keywords, str):
+     keywords = [keywords]
+
+  size = max(1, hashtags_per_run)
+  batches = [list(keywords[i:i + size]) for i in range(0, len(keywords), size)]
+  results = [[] for _ in batches]
+
+  # Optional CSV export
+  with (open(output_file, mode="w", newline="", encoding="utf-8") if output_file else nullcontext()) as csvfile:
+      writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES) if csvfile else None
+      if writer:
+          writer.writeheader()
+      write_lock = threading.Lock()
+
+      def _write_rows(rows):
+          with write_lock:
+              writer.writerows(rows)
+              csvfile.flush()
+
+      with ThreadPoolExecutor(max_workers=max(1, min(max_parallel_runs, len(batches) or 1))) as pool:
+          futures = {
+              pool.submit(
+                  _run_batch, client, batch, sort_by,
+                  max_items_per_keyword, since, _write_rows if writer else None,
+              ): i
+              for i, batch in enumerate(batches)
+          }
+          # Collect each run as it finishes instead of waiting on them in order
+          for future in as_completed(futures):
+              i = futures[future]
+              try:
+                  rows = future.result()
+              except Exception as e:
+                  print(f"❌ Error scraping keywords {batches[i]}: {e}")
+                  continue
+              results[i] = rows
+              print(f"Added {len(rows)} TikTok items for {batches[i]}")
+      # log_to_browser(f"Added {len(dataset_items)} to {output_file}")
 
-  # Prepare CSV file
-  with open(output_file, mode="w", newline="", encoding="utf-8") as csvfile:
-      writer = csv.DictWriter(csvfile, fieldnames=["platform", "keyword", "content", "author", "timestamp", "url"])
-      writer.writeheader()
-
-      for keyword in keywords:
-        # Prepare the Actor input
-        print(f"🔎 Fetching '{keyword}' from TikTok based on {sort_by}...")
-
-        run_input = {
-            "hashtags": [keyword],
-            "resultsPerPage": 25,
-            "profileSorting": sort_by,
-            "proxyCountryCode": "None",
-        }
-
-        try: 
-          # Run the Actor and wait for it to finish
-          run = client.actor("clockworks/tiktok-scraper").call(run_input=run_input)
-
-          # Dataset ID for the run
-          dataset_id = run["defaultDatasetId"]
-          print('fetched tiktok data')
-          dataset_items = client.dataset(dataset_id).iterate_items()
-
-          for item in dataset_items:
-              author_meta = item.get("authorMeta") or {}
-              author = (
-                  author_meta.get("name") or          # handle/username
-                  author_meta.get("uniqueId") or      # sometimes used
-                  author_meta.get("nickName") or ""   # display name fallback
-              )
-
-              writer.writerow({
-                  "platform": "tiktok",
-                  "keyword": keyword,
-                  "content": item.get("text", ""),  # video description/caption
-                  # "author": item.get("authorMeta.name", {}).get("name", ""),  # username
-                  "author": author,
-                  "timestamp": item.get("createTimeISO", ""),  # ISO timestamp
-                  "url": item.get("webVideoUrl", ""),  # video URL
-              })
-
-          print(f"Added {item} to {output_file}")
-
-        except Exception as e:
-          print(f"❌ Error scraping keyword '{keyword}': {e}")
-      
-      # print(f"Added {len(dataset_items)} to {output_file}")
-      # log_to_browser(f"Added {len(dataset_items)} to {output_file}")
\ No newline at end of file
+  return [row for rows in results for row in rows]
@@ -1,7 +1,7 @@
 # forumscout_ingestion/main.py
 # First run "source ~/.bashrc" in terminal
 import os
-import requests
+from project_code import http_client
 import time
 import csv
 import datetime
@@ -40,7 +40,7 @@ def fetch_forumscout_data(endpoint, keyword):
         "keyword": keyword,
         # "sort_by": recent
     }
-    response = requests.get(url, headers=headers, params=params)
+    response = http_client.get(url, headers=headers, params=params)
     if response.status_code == 200:
         return response.json()
     else:
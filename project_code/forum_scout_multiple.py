@@ -1,18 +1,26 @@
 import os
-import requests
-import time
 import csv
+import json
+import threading
+import time
 import datetime as dt
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
 # from utils.logger import log_to_browser
 from project_code.fetch_tiktok_data import scrape_tiktok_data
+from project_code import clients, http_client
+from project_code.disk_cache import DiskCache
+from project_code import watermarks
+from project_code.timestamps import parse_timestamps_utc, ensure_posted_at
+from project_code.rate_limit import make_limiters
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
 # ----------------------------
 # Environment & Paths
 # ----------------------------
-load_dotenv()
+clients.load_env()
 
 # Project root = parent of project_code
 PROJECT_ROOT = Path(__file__).resolve().parents[1]          # .../trend_monitoring
@@ -26,6 +34,51 @@ FORUMSCOUT_API_KEY = os.getenv("FORUMSCOUT_API_KEY")
 APIFY_CLIENT_TOKEN = os.getenv("APIFY_CLIENT_TOKEN")
 BASE_URL = "https://forumscout.app/api"
 
+# Per-platform request rate (requests/second, or (requests/second, burst)).
+# Platforms not listed get DEFAULT_RATE_LIMIT, which matches the old 1s sleep.
+DEFAULT_RATE_LIMIT = 1.0
+RATE_LIMITS = {
+    # "instagram": 2.0,
+    # "reddit_comments": (1.0, 3),
+}
+MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "8"))
+
+# ----------------------------
+# Response cache
+# ----------------------------
+# Successful ForumScout responses are cached on disk, keyed on
+# (endpoint, keyword, sort_by, upload_date). TTLs are per endpoint, in seconds.
+USE_CACHE = os.getenv("FORUMSCOUT_CACHE", "1") != "0"
+CACHE_PATH = OUTPUT_DIR / "cache" / "forumscout.sqlite"
+CACHE_MAX_ENTRIES = int(os.getenv("FORUMSCOUT_CACHE_MAX_ENTRIES", "2000"))
+DEFAULT_CACHE_TTL = 60 * 60
+CACHE_TTLS = {
+    "instagram_search": 6 * 60 * 60,
+    "youtube_search": 12 * 60 * 60,
+    "reddit_posts_search": 3 * 60 * 60,
+    "reddit_comments_search": 60 * 60,
+    "x_search": 30 * 60,
+}
+
+# ----------------------------
+# Incremental ingestion state
+# ----------------------------
+# Watermarks and the merged post history live next to the cache so the weekly
+# workflow restores them between runs.
+WATERMARKS_JSON = OUTPUT_DIR / "cache" / "ingest_watermarks.json"
+HISTORY_CSV = OUTPUT_DIR / "cache" / "forumscout_history.csv"
+INCREMENTAL_MAX_PAGES = int(os.getenv("INCREMENTAL_MAX_PAGES", "5"))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES)
+        return _cache
+
 # Example endpoints (you likely pass these in externally):
 # ENDPOINTS = {
 #     "instagram": "instagram_search",
@@ -38,7 +91,18 @@ BASE_URL = "https://forumscout.app/api"
 # ----------------------------
 # Helpers
 # ----------------------------
-def fetch_forumscout_data(endpoint, keyword, sort_by=None, recency=None):
+def fetch_forumscout_data(endpoint, keyword, sort_by=None, recency=None, use_cache=None, limiter=None, page=None):
+    use_cache = USE_CACHE if use_cache is None else use_cache
+    page = page if page and page > 1 else None
+    cache_key = json.dumps([endpoint, keyword, sort_by, recency] + ([page] if page else []))
+    if use_cache:
+        cached = _get_cache().get(cache_key, ttl=CACHE_TTLS.get(endpoint, DEFAULT_CACHE_TTL))
+        if cached is not None:
+            print(f"Fetched {keyword} from {endpoint} (cached)")
+            return cached
+
+    if limiter is not None:
+        limiter.acquire()  # only network calls count against the quota
     url = f"{BASE_URL}/{endpoint}"
     headers = {"X-API-Key": FORUMSCOUT_API_KEY}
     params = {
@@ -46,11 +110,20 @@ def fetch_forumscout_data(endpoint, keyword, sort_by=None, recency=None):
         "sort_by": sort_by,
         "upload_date": recency
     }
-    response = requests.get(url, headers=headers, params=params, timeout=60)
+    if page:
+        params["page"] = page
+    try:
+        response = http_client.get(url, headers=headers, params=params)
+    except Exception as e:
+        print(f"Error fetching {keyword} from {endpoint}: {e}")
+        return []
     if response.status_code == 200:
         print(f"Fetched {keyword} from {endpoint}!")
         # log_to_browser(f"Fetched {keyword} from {endpoint}!")
-        return response.json()
+        data = response.json()
+        if use_cache:
+            _get_cache().set(cache_key, data)
+        return data
     else:
         print(f"Error fetching {keyword} from {endpoint}: {response.status_code}")
         # log_to_browser(f"Error fetching {keyword} from {endpoint}: {response.status_code}")
@@ -59,19 +132,22 @@ def fetch_forumscout_data(endpoint, keyword, sort_by=None, recency=None):
 def normalize_result(post, platform, keyword):
     # print(f"Normalizing result for {platform} with keyword {keyword}")
     # log_to_browser(f'Normalizing result for {post.get("url")} from {platform} with keyword {keyword}')
+    timestamp = (
+        post.get("date")
+        or post.get("published_at")
+        or post.get("timestamp")
+        or post.get("created_at")
+    )
     return {
         "platform": platform,
         "keyword": keyword,
         "content": post.get("text") or post.get("content") or post.get("snippet") or "",
         "author": post.get("username") or post.get("author") or "",
-        "timestamp": (
-            post.get("date")
-            or post.get("published_at")
-            or post.get("timestamp")
-            or post.get("created_at")
-            or dt.datetime.utcnow().isoformat()
-        ),
-        "url": post.get("url") or post.get("link") or ""
+        # Undated posts are stamped "now" so the 3-month filter keeps them, and
+        # flagged so the stand-in time never advances a watermark
+        "timestamp": timestamp or dt.datetime.utcnow().isoformat(),
+        "url": post.get("url") or post.get("link") or "",
+        watermarks.SYNTHESIZED_COLUMN: not timestamp,
     }
 
 def write_to_csv(records, output_file):
@@ -89,50 +165,74 @@ def write_to_csv(records, output_file):
         print(f"Successfully added records to {output_file}")
         # log_to_browser(f"Successfully added records to {output_file}")
 
-def safe_read_csv(path):
+def _drop_repeated_headers(df: pd.DataFrame) -> pd.DataFrame:
+    """Remove header rows that some scrapers append mid-file (vectorized row == header check)."""
+    if df.empty:
+        return df
+    header = np.array([str(c) for c in df.columns], dtype=object)
+    is_header = (df.to_numpy(dtype=object) == header).all(axis=1)
+    return df[~is_header]
+
+def _write_quarantine(bad_lines, quarantine_path):
+    quarantine_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(quarantine_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(bad_lines)
+
+def safe_read_csv(path, quarantine_path=None):
+    """
+    Load a scraped CSV as strings. Tries the fast C parser first and only
+    re-parses with the tolerant python engine if the file is malformed; rows
+    that still can't be parsed are written to `quarantine_path`
+    (default: <name>_quarantine.csv next to the input) instead of being dropped silently.
+    """
     p = Path(path)
     print("[safe_read_csv] path:", p)
+    if not p.exists() or p.stat().st_size == 0:
+        print(f"[safe_read_csv] Empty or missing: {p}")
+        return None
+
+    start = time.perf_counter()
+    bad_lines = []
     try:
-        if not p.exists() or p.stat().st_size == 0:
-            print(f"[safe_read_csv] Empty or missing: {p}")
-            return None
-        df = pd.read_csv(
-            p,
-            engine="python",         # tolerant parser
-            encoding="utf-8-sig",    # strip BOM if present
-            on_bad_lines="skip",     # skip malformed lines
-            dtype=str
-        )
-        if df is None or df.shape[1] == 0:
-            print(f"[safe_read_csv] No columns parsed: {p}")
-            return None
-
-        # Remove duplicate header rows that some scrapers append
-        header_map = dict(zip(df.columns, df.columns))
-        df = df[~df.apply(lambda r: all(str(r[c]) == str(header_map[c]) for c in df.columns), axis=1)]
-
-        # Normalize column names
-        df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-        df = df.reset_index(drop=True)
-        print(f"[safe_read_csv] Loaded {len(df)} rows, {len(df.columns)} cols from {p}")
-        return df
-    except Exception as e:
-        print(f"[safe_read_csv] python engine failed ({e}); trying fallback…")
         try:
+            df = pd.read_csv(p, encoding="utf-8-sig", dtype=str, on_bad_lines="error")
+            engine = "c"
+        except pd.errors.ParserError as e:
+            print(f"[safe_read_csv] C parser failed ({e}); re-parsing with python engine…")
             df = pd.read_csv(
                 p,
-                encoding="utf-8-sig",
-                on_bad_lines="skip",
-                dtype=str
+                engine="python",         # tolerant parser
+                encoding="utf-8-sig",    # strip BOM if present
+                dtype=str,
+                on_bad_lines=lambda fields: bad_lines.append(fields),  # returns None -> row skipped
             )
-            # Same cleanup
-            header_map = dict(zip(df.columns, df.columns))
-            df = df[~df.apply(lambda r: all(str(r[c]) == str(header_map[c]) for c in df.columns), axis=1)]
-            df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-            return df.reset_index(drop=True)
-        except Exception as e2:
-            print(f"[safe_read_csv] Fallback failed: {e2}")
-            return None
+            engine = "python"
+    except pd.errors.EmptyDataError:
+        print(f"[safe_read_csv] No columns parsed: {p}")
+        return None
+    except Exception as e:
+        print(f"[safe_read_csv] Failed to read {p}: {e}")
+        return None
+
+    if df is None or df.shape[1] == 0:
+        print(f"[safe_read_csv] No columns parsed: {p}")
+        return None
+
+    df = _drop_repeated_headers(df)
+
+    # Normalize column names
+    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+    df = df.reset_index(drop=True)
+
+    if bad_lines:
+        quarantine_path = Path(quarantine_path) if quarantine_path else p.with_name(f"{p.stem}_quarantine.csv")
+        _write_quarantine(bad_lines, quarantine_path)
+        print(f"[safe_read_csv] Quarantined {len(bad_lines)} malformed row(s) to {quarantine_path}")
+
+    elapsed = time.perf_counter() - start
+    print(f"[safe_read_csv] Loaded {len(df)} rows, {len(df.columns)} cols from {p} "
+          f"in {elapsed:.2f}s (engine={engine}, bad_rows={len(bad_lines)})")
+    return df
 
 def merge_union(df_a, df_b):
     if df_a is not None and df_b is not None:
@@ -145,16 +245,43 @@ def merge_union(df_a, df_b):
         return merged
     return df_a if df_a is not None else df_b
 
+RECORD_COLUMNS = ["platform", "keyword", "content", "author", "timestamp", "url"]
+
+def records_to_frame(records) -> pd.DataFrame:
+    """
+    Build the typed ingestion frame straight from normalized records. Every
+    source's raw `timestamp` is parsed once here into `posted_at` (datetime64[ns, UTC]).
+    """
+    df = pd.DataFrame.from_records(records)
+    extra = [c for c in df.columns if c not in RECORD_COLUMNS]   # e.g. TikTok engagement counts
+    df = df.reindex(columns=RECORD_COLUMNS + extra).astype("string")
+    df["posted_at"] = parse_timestamps_utc(df["timestamp"])
+    return df
+
+def merge_history(new_df, history_path, months: int = 3):
+    """
+    Merge newly fetched rows into the stored history (newest copy of each
+    (platform, url) wins), prune it to the last `months` and save it back.
+    """
+    history_path = Path(history_path)
+    merged = merge_union(ensure_posted_at(safe_read_csv(history_path)), new_df)
+    if merged is None or merged.empty:
+        return merged
+    if "url" in merged.columns:
+        has_url = merged["url"].fillna("").astype(str).str.strip().ne("")
+        deduped = merged[has_url].drop_duplicates(subset=["platform", "url"], keep="last")
+        merged = pd.concat([deduped, merged[~has_url]]).sort_index()
+    merged = filter_recent_posts(merged.reset_index(drop=True), months=months)
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    merged.to_csv(history_path, index=False)
+    print(f"[merge_history] {len(merged)} rows in {history_path}")
+    return merged
+
 def _coerce_to_datetime_utc(series: pd.Series) -> pd.Series:
     """
     Accepts ISO strings or Unix epoch (seconds or ms) and returns UTC datetimes.
     """
-    s = pd.to_numeric(series, errors="coerce")
-    if s.notna().any():
-        # anything >= 1e12 is probably ms
-        s = s.where(s < 1e12, s / 1000.0)
-        return pd.to_datetime(s, unit="s", utc=True, errors="coerce")
-    return pd.to_datetime(series, utc=True, errors="coerce")
+    return parse_timestamps_utc(series)
 
 def filter_recent_posts(
     df: pd.DataFrame,
@@ -166,23 +293,24 @@ def filter_recent_posts(
 ) -> pd.DataFrame:
     """
     Keeps only rows whose post date is within the last `months` calendar months.
+    Uses the typed `posted_at` column when ingestion already parsed it.
     If no recognizable date column exists, returns df unchanged.
     """
     if df is None or df.empty:
         return df
 
-    df = df.copy()
     # Find first date-like column you have
     date_col = next((c for c in candidate_date_cols if c in df.columns), None)
     if not date_col:
         print("[filter_recent_posts] No date column found; leaving df unchanged.")
         return df
 
-    df["_posted_at_utc"] = _coerce_to_datetime_utc(df[date_col])
+    posted = df[date_col]
+    if not isinstance(posted.dtype, pd.DatetimeTZDtype):
+        posted = _coerce_to_datetime_utc(posted)
     cutoff = pd.Timestamp.now(tz="UTC") - pd.DateOffset(months=months)
-    recent = df[df["_posted_at_utc"] >= cutoff].drop(columns=["_posted_at_utc"])
-    # Drop rows where we couldn't parse a date
-    recent = recent[recent[date_col].notna()].reset_index(drop=True)
+    # Rows we couldn't parse (NaT) compare False and are dropped
+    recent = df[posted >= cutoff].reset_index(drop=True)
 
     print(f"[filter_recent_posts] Kept {len(recent)}/{len(df)} rows since {cutoff.date()}.")
     return recent
@@ -210,6 +338,47 @@ def map_sort_for_platform(platform: str, choice: str | None) -> str | None:
         "tiktok": "top"
     }.get(platform, None)
 
+# ----------------------------
+# Ingestion tasks
+# ----------------------------
+def _ingest_forumscout(platform, endpoint, keyword, sb, recency_in, limiter, use_cache, mark=None, incremental=False,
+                       newest_first=True):
+    print(f"🔎 {platform} | kw='{keyword}' | sort_by={sb} | recency={recency_in}")
+    if not incremental:
+        posts = fetch_forumscout_data(endpoint, keyword, sb, recency_in, use_cache=use_cache, limiter=limiter)
+        return [normalize_result(p, platform, keyword) for p in posts]
+
+    # Incremental: page forward only until we reach posts we've already seen.
+    # Without a watermark this is a first run, so behave like a normal single page.
+    # Only a newest-first (Latest) listing can stop at the first known or stale
+    # page; under other sort orders later pages may still hold new posts.
+    records = []
+    for page in range(1, (INCREMENTAL_MAX_PAGES if mark else 1) + 1):
+        posts = fetch_forumscout_data(endpoint, keyword, sb, recency_in, use_cache=use_cache, limiter=limiter, page=page)
+        if not posts:
+            break
+        fresh, reached_known = watermarks.split_new([normalize_result(p, platform, keyword) for p in posts], mark)
+        records.extend(fresh)
+        if newest_first and (reached_known or not fresh):
+            break
+    print(f"   {platform} | kw='{keyword}' | {len(records)} new post(s)")
+    return records
+
+def _ingest_tiktok(keywords, sb, recency_in, limiter, tiktok_csv=None, since=None):
+    limiter.acquire()
+    print(f"🎵 TikTok | kws={list(keywords)} | sort_by={sb} | recency={recency_in}")
+    return scrape_tiktok_data(APIFY_CLIENT_TOKEN, list(keywords), sb, recency_in, output_file=tiktok_csv, since=since)
+
+def _interleave(groups: list) -> list:
+    """Positions of `groups` (a group label per task), round-robin across groups."""
+    queues = {}
+    for i, group in enumerate(groups):
+        queues.setdefault(group, []).append(i)
+    order = []
+    for round_ in zip_longest(*queues.values()):
+        order.extend(i for i in round_ if i is not None)
+    return order
+
 # ----------------------------
 # Main ingestion (single-pass)
 # ----------------------------
@@ -218,60 +387,86 @@ def run_ingestion(
     endpoints,                      # e.g. {"instagram":"instagram_search", "tiktok":"tiktok", ...}
     sort_by: str = "Latest",
     recency: str | None = None,
-    output_file: Path | str = OUTPUT_DIR / "forumscout_data.csv"
+    output_file: Path | str | None = OUTPUT_DIR / "forumscout_data.csv",
+    tiktok_csv: Path | str | None = None,
+    concurrent: bool = True,
+    max_workers: int | None = None,
+    rate_limits: dict | None = None,
+    use_cache: bool | None = None,
+    incremental: bool = False,
 ):
-    output_file = Path(output_file)
-    TEMP_CSV   = OUTPUT_DIR / "forumscout_data_temp.csv"
-    TIKTOK_CSV = OUTPUT_DIR / "tiktok_data.csv"
-
-    # Fresh run
-    TEMP_CSV.write_text("")
-    TIKTOK_CSV.write_text("")
-    output_file.write_text("")
+    """
+    Fetch every platform × keyword pair into one in-memory frame, keep the last
+    3 months and return it. The frame is written to `output_file` once (skipped
+    if None); `tiktok_csv` optionally exports the raw TikTok rows as well.
+    With `concurrent=True` the pairs are fetched on a thread pool; `rate_limits`
+    overrides RATE_LIMITS per platform. `use_cache=False` bypasses the ForumScout
+    response cache (defaults to FORUMSCOUT_CACHE).
 
-    all_records = []
+    With `incremental=True` only posts newer than each (platform, keyword)
+    watermark are fetched; they are merged into HISTORY_CSV and `output_file`
+    gets the whole 3-month window from that history.
+    """
     recency_in = recency.replace(" ", "_") if isinstance(recency, str) else recency
+    marks = watermarks.load_watermarks(WATERMARKS_JSON) if incremental else {}
+    limiters = make_limiters(
+        endpoints.keys(),
+        {**RATE_LIMITS, **(rate_limits or {})},
+        default_rate=DEFAULT_RATE_LIMIT,
+    )
 
-    # >>> STRICT SEQUENTIAL: platform × keyword <<<
+    # One task per ForumScout platform × keyword; TikTok is one task that runs
+    # all keywords through Apify. Each platform has its own limiter, so
+    # independent endpoints run in parallel while each keeps to its own quota.
+    tasks = []
+    platform_of = []  # task position -> platform, for interleaving submission
     for platform, endpoint in endpoints.items():
+        sb = map_sort_for_platform(platform, sort_by)
+        if platform == "tiktok":
+            # Stop downloading TikTok items older than the 3-month window (or the watermark)
+            window_start = pd.Timestamp.now(tz="UTC") - pd.DateOffset(months=3)
+            since = {
+                kw: max(filter(None, [window_start, watermarks.mark_timestamp(marks.get(watermarks.mark_key(platform, kw)))]))
+                for kw in keywords
+            }
+            tasks.append((_ingest_tiktok, (keywords, sb, recency_in, limiters[platform], tiktok_csv, since)))
+            platform_of.append(platform)
+            continue
         for keyword in keywords:
-            sb = map_sort_for_platform(platform, sort_by)
-
-            if platform == "tiktok":
-                print(f"🎵 TikTok | kw='{keyword}' | sort_by={sb} | recency={recency_in}")
-                # Try to force writing to our known CSV; fall back to legacy signatures
-                try:
-                    scrape_tiktok_data(APIFY_CLIENT_TOKEN, keyword, sb, recency_in, save_csv=str(TIKTOK_CSV))
-                except TypeError:
-                    try:
-                        # some versions expect a list of keywords
-                        scrape_tiktok_data(APIFY_CLIENT_TOKEN, [keyword], sb, recency_in)
-                    except TypeError:
-                        # some expect single keyword but no save_csv
-                        scrape_tiktok_data(APIFY_CLIENT_TOKEN, keyword, sb, recency_in)
-                time.sleep(1)  # rate-limit per task
-                continue
-
-            # Non-TikTok (ForumScout)
-            print(f"🔎 {platform} | kw='{keyword}' | sort_by={sb} | recency={recency_in}")
-            posts = fetch_forumscout_data(endpoint, keyword, sb, recency_in)
-            normalized = [normalize_result(p, platform, keyword) for p in posts]
-            all_records.extend(normalized)
-            time.sleep(1)
-
-    # Write ForumScout temp if any
-    if all_records:
-        write_to_csv(all_records, str(TEMP_CSV))
-
-    # Read, filter last 3 months, and merge
-    df_forum = filter_recent_posts(safe_read_csv(TEMP_CSV), months=3)
-    df_tt    = filter_recent_posts(safe_read_csv(TIKTOK_CSV), months=3)
-
-    print("TEMP rows:", 0 if df_forum is None else len(df_forum))
-    print("TT   rows:", 0 if df_tt    is None else len(df_tt))
-
-    out_df = merge_union(df_forum, df_tt)
-    if out_df is None or out_df.empty:
-        out_df = pd.DataFrame([])
-    out_df.to_csv(output_file, index=False)
-    print(f"✅ Saved {len(out_df)} rows to {output_file}")
\ No newline at end of file
+            mark = marks.get(watermarks.mark_key(platform, keyword))
+            tasks.append((_ingest_forumscout, (platform, endpoint, keyword, sb, recency_in, limiters[platform],
+                                               use_cache, mark, incremental, sort_by == "Latest")))
+            platform_of.append(platform)
+
+    if concurrent and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as pool:
+            # Workers wait on their platform's limiter, so submit the platforms
+            # round-robin; in platform order one platform's backlog would hold
+            # every worker and the platforms would effectively run one by one
+            futures = {i: pool.submit(tasks[i][0], *tasks[i][1]) for i in _interleave(platform_of)}
+            # Collect in task order so output order matches the sequential run
+            results = [futures[i].result() for i in range(len(tasks))]
+    else:
+        results = [fn(*args) for fn, args in tasks]
+
+    # Filter last 3 months and (optionally) merge with history, all in memory
+    out_df = filter_recent_posts(records_to_frame([rec for batch in results for rec in batch]), months=3)
+    print("Fetched rows:", len(out_df))
+
+    if incremental:
+        # TikTok can't stop early, so drop what we already have before merging
+        out_df = watermarks.filter_new_rows(out_df, marks)
+        print("NEW  rows:", len(out_df))
+        new_marks = watermarks.advance_watermarks(marks, out_df)
+        out_df = merge_history(out_df.drop(columns=[watermarks.SYNTHESIZED_COLUMN], errors="ignore"), HISTORY_CSV, months=3)
+        watermarks.save_watermarks(new_marks, WATERMARKS_JSON)
+
+    if out_df is None:
+        out_df = records_to_frame([])
+    out_df = out_df.drop(columns=[watermarks.SYNTHESIZED_COLUMN], errors="ignore")
+    if output_file is not None:
+        output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        out_df.to_csv(output_file, index=False)
+        print(f"✅ Saved {len(out_df)} rows to {output_file}")
+    return out_df
@@ -0,0 +1,143 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ----------------------------
+# Config
+# ----------------------------
+# (connect, read) timeouts in seconds, per host
+DEFAULT_TIMEOUT = (5, 30)
+HOST_TIMEOUTS = {
+    "forumscout.app": (10, 60),
+    "www.googleapis.com": (5, 15),
+    "www.reddit.com": (5, 20),
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1.0"))   # seconds
+BACKOFF_MAX = 60.0                                               # cap per wait
+POOL_SIZE = 16
+
+_sessions = {}
+_stats = {}
+_lock = threading.Lock()
+
+# ----------------------------
+# Sessions
+# ----------------------------
+def get_session(host: str) -> requests.Session:
+    """One pooled keep-alive session per host, shared across threads."""
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+def close_sessions():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+# ----------------------------
+# Stats
+# ----------------------------
+def _record(host, elapsed, retried=False, failed=False):
+    with _lock:
+        s = _stats.setdefault(host, {"requests": 0, "retries": 0, "failures": 0, "total_s": 0.0, "max_s": 0.0})
+        s["requests"] += 1
+        s["retries"] += int(retried)
+        s["failures"] += int(failed)
+        s["total_s"] += elapsed
+        s["max_s"] = max(s["max_s"], elapsed)
+
+def get_stats() -> dict:
+    with _lock:
+        return {host: dict(s) for host, s in _stats.items()}
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+def format_stats() -> list[str]:
+    """One human-readable line per host, for the run log."""
+    lines = []
+    for host, s in sorted(get_stats().items()):
+        avg = s["total_s"] / s["requests"] if s["requests"] else 0.0
+        lines.append(
+            f"{host}: requests={s['requests']} retries={s['retries']} failures={s['failures']} "
+            f"avg={avg:.2f}s max={s['max_s']:.2f}s"
+        )
+    return lines
+
+# ----------------------------
+# Requests
+# ----------------------------
+def _retry_after_seconds(response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+def _backoff(attempt: int) -> float:
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def request(method: str, url: str, timeout=None, max_retries: int | None = None, **kwargs) -> requests.Response:
+    """
+    Send a request through the pooled session for the URL's host.
+    Retries connection errors and RETRY_STATUSES with exponential backoff + jitter,
+    honouring Retry-After. Returns the last response (callers check the status);
+    raises the last exception if every attempt failed to connect.
+    """
+    host = urlsplit(url).hostname or ""
+    session = get_session(host)
+    timeout = timeout or HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+
+    for attempt in range(max_retries + 1):
+        last_attempt = attempt == max_retries
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record(host, time.monotonic() - start, retried=not last_attempt, failed=last_attempt)
+            if last_attempt:
+                raise
+            wait = _backoff(attempt)
+            print(f"[http] {host}: {type(e).__name__}; retry {attempt + 1}/{max_retries} in {wait:.1f}s")
+            time.sleep(wait)
+            continue
+
+        elapsed = time.monotonic() - start
+        if response.status_code not in RETRY_STATUSES or last_attempt:
+            _record(host, elapsed, failed=response.status_code >= 400)
+            return response
+
+        _record(host, elapsed, retried=True)
+        retry_after = _retry_after_seconds(response)
+        wait = min(BACKOFF_MAX, retry_after) if retry_after is not None else _backoff(attempt)
+        print(f"[http] {host}: HTTP {response.status_code}; retry {attempt + 1}/{max_retries} in {wait:.1f}s")
+        response.close()
+        time.sleep(wait)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
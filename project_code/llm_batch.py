@@ -0,0 +1,198 @@
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from project_code import clients
+from project_code.llm_cache import USE_LLM_CACHE, get_llm_cache
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "output"
+
+# ------------------------------------------------------------
+# OpenAI Batch API mode
+# ------------------------------------------------------------
+# For runs with no one waiting on them (the weekly report), chat completions
+# can go through the Batch API instead: every request of a round is written to
+# one JSONL file, uploaded, submitted as a batch, polled until it finishes and
+# mapped back to request order by custom_id. Batched tokens cost about half and
+# do not count against the synchronous rate limits. Requests already in the
+# LLM cache are not submitted; requests the batch could not answer (errors,
+# expiry, timeout, or API calls that keep failing) fall back to the synchronous
+# scheduler. Polling errors are retried with backoff. As with the scheduler,
+# `accept` decides which answers may be cached.
+USE_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "0") == "1"
+BATCH_DIR = OUTPUT_DIR / "batches"
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "30"))
+BATCH_TIMEOUT = float(os.getenv("LLM_BATCH_TIMEOUT_MINUTES", "180")) * 60
+BATCH_DONE = {"completed", "failed", "expired", "cancelled"}
+BATCH_POLL_RETRIES = int(os.getenv("LLM_BATCH_POLL_RETRIES", "5"))
+BATCH_BACKOFF_MAX = 300.0
+
+def write_batch_file(requests: list, path) -> Path:
+    """Write one Batch API line per request; custom_id is the request's position."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for i, request in enumerate(requests):
+            line = {"custom_id": f"req-{i}", "method": "POST", "url": BATCH_ENDPOINT, "body": request}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+def parse_batch_output(text: str) -> dict:
+    """Batch output JSONL -> {position: (content, total_tokens)} for the successful lines."""
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            continue
+        body = response.get("body") or {}
+        try:
+            content = body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            continue
+        tokens = (body.get("usage") or {}).get("total_tokens")
+        results[int(item["custom_id"].split("-", 1)[1])] = (content, tokens)
+    return results
+
+
+class BatchRunner:
+    """
+    Drop-in for LLMScheduler().run that sends each call's requests as one
+    Batch API job and blocks until it finishes. Returns contents in order.
+    """
+
+    def __init__(self, client_factory=None, poll_seconds: float = BATCH_POLL_SECONDS,
+                 timeout: float = BATCH_TIMEOUT, use_cache: bool | None = None, fallback=None,
+                 batch_dir=None, poll_retries: int = BATCH_POLL_RETRIES):
+        self.client_factory = client_factory or clients.openai_client
+        self.poll_seconds = poll_seconds
+        self.timeout = timeout
+        self.poll_retries = poll_retries
+        self.cache = get_llm_cache() if (USE_LLM_CACHE if use_cache is None else use_cache) else None
+        self.fallback = fallback
+        self.batch_dir = Path(batch_dir or BATCH_DIR)
+        self.rounds = 0
+        self.stats = {"submitted": 0, "completed": 0, "cached": 0, "fallback": 0, "tokens": 0}
+
+    def _fallback(self, requests: list, accept=None) -> list:
+        if self.fallback is None:
+            from project_code.llm_scheduler import LLMScheduler
+            self.fallback = LLMScheduler(use_cache=self.cache is not None).run
+        return self.fallback(requests, accept=accept)
+
+    def _cancel(self, client, batch):
+        try:
+            return client.batches.cancel(batch.id)
+        except Exception as e:
+            print(f"[batch] cancel failed: {e}")
+            return batch
+
+    def _retrieve(self, client, batch):
+        """batches.retrieve, retried with exponential backoff; raises once `poll_retries` are used up."""
+        for attempt in range(self.poll_retries + 1):
+            try:
+                return client.batches.retrieve(batch.id)
+            except Exception as e:
+                if attempt == self.poll_retries:
+                    raise
+                delay = min(BATCH_BACKOFF_MAX, self.poll_seconds * 2 ** (attempt + 1))
+                print(f"[batch] polling {batch.id} failed ({type(e).__name__}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _wait(self, client, batch):
+        deadline = time.monotonic() + self.timeout
+        while batch.status not in BATCH_DONE:
+            if time.monotonic() >= deadline:
+                print(f"[batch] {batch.id} still {batch.status} after {self.timeout / 60:.0f} min; cancelling")
+                return self._cancel(client, batch)
+            time.sleep(self.poll_seconds)
+            batch = self._retrieve(client, batch)
+            counts = getattr(batch, "request_counts", None)
+            if counts is not None:
+                print(f"[batch] {batch.id} {batch.status}: {counts.completed}/{counts.total} done, {counts.failed} failed")
+        return batch
+
+    def _submit(self, requests: list) -> dict:
+        """
+        Run `requests` as one batch; returns {position: (content, tokens)} for
+        those it answered. API errors end the round with no answers, so the
+        whole round falls back instead of failing the run.
+        """
+        self.rounds += 1
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = write_batch_file(requests, self.batch_dir / f"batch-{stamp}-round{self.rounds}.jsonl")
+        client, batch = None, None
+        try:
+            client = self.client_factory()
+            batch = self._create(client, path, len(requests))
+            batch = self._wait(client, batch)
+            return self._collect(client, batch, path)
+        except Exception as e:
+            print(f"[batch] round {self.rounds} failed ({type(e).__name__}: {e})")
+            if batch is not None and batch.status not in BATCH_DONE:
+                self._cancel(client, batch)  # don't pay for answers the fallback is about to fetch
+            return {}
+
+    def _create(self, client, path, n_requests: int):
+        with open(path, "rb") as f:
+            upload = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=upload.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        print(f"[batch] round {self.rounds}: submitted {n_requests} request(s) as {batch.id} ({path.name})")
+        return batch
+
+    def _collect(self, client, batch, path) -> dict:
+        if batch.status != "completed":
+            print(f"[batch] {batch.id} ended {batch.status}")
+        # Cancelled and expired batches still return whatever finished
+        output_file_id = getattr(batch, "output_file_id", None)
+        if not output_file_id:
+            return {}
+        text = client.files.content(output_file_id).text
+        path.with_suffix(".output.jsonl").write_text(text, encoding="utf-8")
+        return parse_batch_output(text)
+
+    def run(self, requests: list, accept=None) -> list:
+        if not requests:
+            return []
+        started = time.perf_counter()
+        results = [self.cache.get(request, accept) if self.cache is not None else None for request in requests]
+        todo = [i for i, result in enumerate(results) if result is None]
+        self.stats["cached"] += len(requests) - len(todo)
+
+        if todo:
+            self.stats["submitted"] += len(todo)
+            answered = self._submit([requests[i] for i in todo])
+            for position, (content, tokens) in answered.items():
+                i = todo[position]
+                results[i] = content
+                self.stats["tokens"] += tokens or 0
+                if self.cache is not None:
+                    self.cache.set(requests[i], content, tokens, accept)
+            self.stats["completed"] += len(answered)
+
+            missing = [i for i in todo if results[i] is None]
+            if missing:
+                print(f"[batch] {len(missing)} request(s) not answered by the batch; running them synchronously")
+                self.stats["fallback"] += len(missing)
+                for i, content in zip(missing, self._fallback([requests[i] for i in missing], accept)):
+                    results[i] = content
+
+        print(f"[batch] {len(requests)} request(s) ({len(requests) - len(todo)} cached) in "
+              f"{time.perf_counter() - started:.1f}s")
+        return results
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (f"rounds={self.rounds} submitted={s['submitted']} completed={s['completed']} "
+                f"cached={s['cached']} fallback={s['fallback']} tokens={s['tokens']}")
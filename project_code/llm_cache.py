@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from project_code.disk_cache import DiskCache
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "output"
+
+# ------------------------------------------------------------
+# LLM response cache
+# ------------------------------------------------------------
+# Chat completion responses are stored under a sha256 of the request
+# (model, temperature, messages and any other parameters), so re-running a
+# byte-identical prompt costs nothing. LLM_CACHE=0 turns it off. Callers that
+# validate answers pass `accept(content) -> bool`: rejected answers are never
+# stored, and a stored answer that `accept` rejects counts as a miss.
+USE_LLM_CACHE = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = OUTPUT_DIR / "cache" / "llm.sqlite"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "100")) * 1024 * 1024
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 24 * 60 * 60
+
+def request_key(request: dict) -> str:
+    """Content address of a chat.completions request."""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """request -> {content, tokens} on top of DiskCache, with hit/miss/saved-token counters."""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int | None = LLM_CACHE_MAX_BYTES, ttl: float | None = LLM_CACHE_TTL):
+        self._cache = DiskCache(path, max_entries=max_entries, max_bytes=max_bytes)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "saved_tokens": 0}
+
+    def get(self, request: dict, accept=None) -> str | None:
+        entry = self._cache.get(request_key(request), ttl=self.ttl)
+        if entry is not None and accept is not None and not accept(entry["content"]):
+            entry = None
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["saved_tokens"] += entry.get("tokens") or 0
+        return entry["content"]
+
+    def set(self, request: dict, content: str, tokens: int | None = None, accept=None):
+        if content is None or (accept is not None and not accept(content)):
+            return
+        self._cache.set(request_key(request), {"content": content, "tokens": tokens or 0})
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"hits": 0, "misses": 0, "saved_tokens": 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        total = s["hits"] + s["misses"]
+        rate = s["hits"] / total if total else 0.0
+        return f"hits={s['hits']} misses={s['misses']} hit_rate={rate:.0%} saved_tokens={s['saved_tokens']}"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache | None:
+    """The shared cache, or None when LLM_CACHE=0."""
+    global _cache
+    if not USE_LLM_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(LLM_CACHE_PATH)
+        return _cache
+
+def cached_stream(client, **request):
+    """
+    Yield the response content of client.chat.completions.create(**request) as
+    it is generated; the full text is cached once the stream ends. A cached
+    response is yielded in one piece.
+    """
+    cache = get_llm_cache()
+    if cache is not None:
+        content = cache.get(request)
+        if content is not None:
+            yield content
+            return
+    stream = client.chat.completions.create(**request, stream=True, stream_options={"include_usage": True})
+    parts, tokens = [], None
+    for chunk in stream:
+        if chunk.usage is not None:
+            tokens = chunk.usage.total_tokens
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            yield delta
+    if cache is not None:
+        cache.set(request, "".join(parts), tokens)
+
+def cached_completion(client, accept=None, **request) -> str:
+    """
+    client.chat.completions.create(**request) through the cache; returns the
+    message content. Only content that `accept` (if given) approves is cached.
+    """
+    cache = get_llm_cache()
+    if cache is not None:
+        content = cache.get(request, accept)
+        if content is not None:
+            return content
+    resp = client.chat.completions.create(**request)
+    content = resp.choices[0].message.content
+    if cache is not None:
+        usage = getattr(resp, "usage", None)
+        cache.set(request, content, getattr(usage, "total_tokens", None), accept)
+    return content
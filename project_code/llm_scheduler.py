@@ -0,0 +1,202 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from project_code import clients
+from project_code.llm_cache import USE_LLM_CACHE, get_llm_cache
+
+# ------------------------------------------------------------
+# Concurrent chat completions under OpenAI rate limits
+# ------------------------------------------------------------
+# Requests are sent concurrently but never faster than the requests-per-minute
+# and tokens-per-minute budgets allow. 429s and transient errors are retried
+# with backoff (honouring Retry-After). Results come back in request order,
+# and `on_result` can be used to see each one as soon as it arrives.
+# Requests already answered in the LLM cache are not sent at all; with
+# `accept`, only answers it approves are cached or served from the cache.
+RPM_LIMIT = int(os.getenv("OPENAI_RPM", "500"))
+TPM_LIMIT = int(os.getenv("OPENAI_TPM", "200000"))
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+WINDOW_SECONDS = 60.0
+DEFAULT_COMPLETION_TOKENS = 1000
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    """openai exceptions worth retrying (resolved on first use so importing this module stays cheap)."""
+    openai = clients.lazy_import("openai")
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+def estimate_tokens(request: dict) -> int:
+    """Rough prompt + completion token count for budgeting (~4 characters per token)."""
+    chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+    completion = request.get("max_tokens") or request.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS
+    return chars // 4 + completion
+
+
+class _WindowBudget:
+    """Sliding one-minute budget of `limit` units, shared by the coroutines of one run."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._spent = deque()  # [monotonic time, amount]
+        self._lock = asyncio.Lock()
+
+    def _used(self, now: float) -> int:
+        while self._spent and now - self._spent[0][0] >= WINDOW_SECONDS:
+            self._spent.popleft()
+        return sum(amount for _, amount in self._spent)
+
+    async def acquire(self, amount: int) -> list:
+        # A single request larger than the whole budget still goes through, alone
+        amount = min(amount, self.limit)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self._used(now) + amount <= self.limit:
+                    entry = [now, amount]
+                    self._spent.append(entry)
+                    return entry
+                await asyncio.sleep(max(WINDOW_SECONDS - (now - self._spent[0][0]), 0.05))
+
+    @staticmethod
+    def settle(entry: list, actual: int):
+        """Replace a reservation with the amount actually used."""
+        entry[1] = actual
+
+
+def _retry_after(error) -> float | None:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LLMScheduler:
+    """
+    Run many chat.completions.create requests (dicts of keyword arguments)
+    concurrently within RPM/TPM budgets and return the message contents in order.
+    """
+
+    def __init__(
+        self,
+        rpm: int = RPM_LIMIT,
+        tpm: int = TPM_LIMIT,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        client_factory=None,
+        use_cache: bool | None = None,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        # Retries are handled here, so the SDK's own retry loop is turned off
+        self.client_factory = client_factory or (lambda: clients.async_openai_client(max_retries=0))
+        self.cache = get_llm_cache() if (USE_LLM_CACHE if use_cache is None else use_cache) else None
+        self.stats = {"requests": 0, "retries": 0, "tokens": 0, "cached": 0}
+
+    async def _complete(self, client, request, requests_budget, tokens_budget, semaphore, accept=None) -> str:
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await requests_budget.acquire(1)
+                reservation = await tokens_budget.acquire(estimate_tokens(request))
+                try:
+                    response = await client.chat.completions.create(**request)
+                except retryable_errors() as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = _retry_after(e)
+                    if delay is None:
+                        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                    self.stats["retries"] += 1
+                    print(f"[llm] {type(e).__name__}; retrying in {delay:.1f}s (attempt {attempt + 1})")
+                else:
+                    usage = getattr(response, "usage", None)
+                    used = getattr(usage, "total_tokens", None) or reservation[1]
+                    tokens_budget.settle(reservation, used)
+                    self.stats["requests"] += 1
+                    self.stats["tokens"] += used
+                    content = response.choices[0].message.content
+                    if self.cache is not None:
+                        self.cache.set(request, content, used, accept)
+                    return content
+            # Back off outside the semaphore so other requests keep flowing
+            await asyncio.sleep(delay)
+
+    async def _run(self, requests: list, on_result=None, accept=None) -> list:
+        results = [self.cache.get(request, accept) if self.cache is not None else None for request in requests]
+        todo = [i for i, result in enumerate(results) if result is None]
+        self.stats["cached"] = len(requests) - len(todo)
+        if on_result is not None:
+            for i, result in enumerate(results):
+                if result is not None:
+                    on_result(i, result)
+        if not todo:
+            return results
+
+        requests_budget = _WindowBudget(self.rpm)
+        tokens_budget = _WindowBudget(self.tpm)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        client = self.client_factory()
+        try:
+            async def _one(i):
+                content = await self._complete(client, requests[i], requests_budget, tokens_budget, semaphore, accept)
+                if on_result is not None:
+                    on_result(i, content)
+                return content
+
+            fetched = await asyncio.gather(*(_one(i) for i in todo))
+            for i, content in zip(todo, fetched):
+                results[i] = content
+            return results
+        finally:
+            close = getattr(client, "close", None)
+            if close is not None:
+                await close()
+
+    def run(self, requests: list, on_result=None, accept=None) -> list:
+        """
+        Blocking entry point; safe to call from a thread that already runs an event loop.
+        `on_result(index, content)` is called as each request completes (cache hits first).
+        It runs on the calling thread unless that thread already has an event loop.
+        `accept(content) -> bool` decides which answers may be cached.
+        """
+        if not requests:
+            return []
+        started = time.perf_counter()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            results = asyncio.run(self._run(requests, on_result, accept))
+        else:
+            box = {}
+
+            def _target():
+                try:
+                    box["results"] = asyncio.run(self._run(requests, on_result, accept))
+                except BaseException as e:
+                    box["error"] = e
+
+            worker = threading.Thread(target=_target)
+            worker.start()
+            worker.join()
+            if "error" in box:
+                raise box["error"]
+            results = box["results"]
+        print(f"[llm] {len(requests)} request(s) ({self.stats['cached']} cached), {self.stats['tokens']} tokens, "
+              f"{self.stats['retries']} retries in {time.perf_counter() - started:.1f}s")
+        return results
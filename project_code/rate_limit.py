@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens are added per second up to `capacity`;
+    `acquire()` blocks until a token is available; asking for more than
+    `capacity` at once could never succeed and raises ValueError.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0):
+        if tokens > self.capacity:
+            raise ValueError(f"cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_limiters(platforms, rate_limits=None, default_rate=1.0, default_burst=1):
+    """
+    Build one TokenBucket per platform.
+    `rate_limits` maps platform -> requests/second, or -> (requests/second, burst).
+    """
+    rate_limits = rate_limits or {}
+    limiters = {}
+    for platform in platforms:
+        cfg = rate_limits.get(platform, default_rate)
+        rate, burst = cfg if isinstance(cfg, (tuple, list)) else (cfg, default_burst)
+        limiters[platform] = TokenBucket(rate, burst)
+    return limiters
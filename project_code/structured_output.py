@@ -0,0 +1,124 @@
+import json
+import re
+
+# ------------------------------------------------------------
+# Structured (JSON) model output
+# ------------------------------------------------------------
+# Requests ask for output matching a JSON schema via response_format, and
+# responses are still parsed defensively: candidate objects are found in a
+# single pass over the text (prose or ``` fences around it are ignored) and the
+# first that decodes is checked against the same schema, so callers can re-ask
+# for just the responses that fail.
+
+def json_schema_format(name: str, schema: dict) -> dict:
+    """response_format asking the model for output that matches `schema` exactly."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+# extract_json decodes at most this many times the text's length
+_DECODE_BUDGET = 4
+# Where a JSON object can start: "{" then a key or "}", so braces in prose are skipped cheaply
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+def _objects(text: str) -> list:
+    """
+    Every balanced {...} span of `text` as (start, end), outermost and earliest
+    first. Braces are matched in one pass with a stack, ignoring those inside
+    JSON strings; an unmatched "{" in surrounding prose just stays on the stack.
+    """
+    stack, spans, in_string, escaped = [], [], False, False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == "{":
+            stack.append(i)
+        elif ch == "}" and stack:
+            spans.append((stack.pop(), i + 1))
+        elif ch == '"' and stack:
+            in_string = True
+    spans.sort()
+    return spans
+
+def extract_json(text: str) -> dict:
+    """
+    The first JSON object in `text`: the whole text if it parses, else the
+    earliest (outermost) balanced {...} span that does. Raises ValueError if
+    there is none, including for objects nested too deeply to parse.
+
+    Candidates are decoded one slice at a time. A failed decode reports where
+    it broke, and spans that contain that point would break there too, so
+    they are skipped. Decoding also stops once it has covered a few times the
+    text's length, which keeps adversarial input linear.
+    """
+    text = text or ""
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value
+    except (ValueError, RecursionError):
+        pass
+    budget = _DECODE_BUDGET * len(text)
+    broken_at, skip_to = -1, 0
+    for start, end in _objects(text):
+        if start < skip_to or start < broken_at < end or not _OBJECT_START.match(text, start):
+            continue
+        budget -= end - start
+        if budget < 0:
+            break
+        try:
+            return json.loads(text[start:end])
+        except json.JSONDecodeError as e:
+            broken_at = max(broken_at, start + e.pos)
+        except RecursionError:
+            skip_to = end  # too deep to decode; nothing inside it is worth trying either
+    raise ValueError("no JSON object found in model output")
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+def schema_errors(value, schema: dict, path: str = "$") -> list:
+    """
+    Where `value` breaks `schema`, as ["$.narratives[0].url: expected string", ...].
+    Covers the subset of JSON Schema used for response_format: type,
+    properties, required, additionalProperties=false and items.
+    """
+    expected = schema.get("type")
+    # bool is an int subclass but not a JSON number
+    wrong_type = expected and (not isinstance(value, _TYPES[expected])
+                               or (expected in ("integer", "number") and isinstance(value, bool)))
+    if wrong_type:
+        return [f"{path}: expected {expected}, got {type(value).__name__}"]
+    errors = []
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing '{key}'")
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(schema_errors(item, properties[key], f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}: unexpected '{key}'")
+    elif isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(schema_errors(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+def parse_structured(text: str, schema: dict) -> dict:
+    """extract_json + schema check; raises ValueError listing the first few problems."""
+    value = extract_json(text)
+    errors = schema_errors(value, schema)
+    if errors:
+        more = f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""
+        raise ValueError("; ".join(errors[:5]) + more)
+    return value
@@ -1,16 +1,9 @@
-import openai
-import pandas as pd
-from dotenv import load_dotenv
 from pathlib import Path
-
-# Load environment variables
-load_dotenv()
-
-client = openai.OpenAI()
+from project_code import clients
+from project_code.llm_cache import cached_completion, cached_stream
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # go up to project root
 OUTPUT_DIR = BASE_DIR / "output"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 FINAL_MD = OUTPUT_DIR / "final_narratives.md"
 
 # all_chunks_text = ''
@@ -18,7 +11,7 @@ FINAL_MD = OUTPUT_DIR / "final_narratives.md"
 # with open("../output/gpt_narrative_summary.md", "r", encoding="utf-8") as f:
 #   all_chunks_text = f.read()
 
-def synthesize_final_narratives(summaries_text):
+def _final_request(summaries_text):
   final_prompt = f"""
 You are a social media analyst specializing in narrative research. You are given a combined collection of narrative summaries and post excerpts about Gaza from Instagram captions. These summaries were originally generated in smaller batches, but you must treat them as one unified dataset.
 
@@ -68,7 +61,7 @@ Here is the full combined content:
 {summaries_text}
 \"\"\"
 """
-  response = client.chat.completions.create(
+  return dict(
       model="gpt-4",
       messages=[
           {"role": "system", "content": "You are a social media narrative analyst."},
@@ -76,7 +69,13 @@ Here is the full combined content:
       ],
       temperature=0.4
   )
-  return response.choices[0].message.content
+
+def synthesize_final_narratives(summaries_text):
+  return cached_completion(clients.openai_client(), **_final_request(summaries_text))
+
+def stream_final_narratives(summaries_text):
+  """Same as synthesize_final_narratives, but yields the text as it is generated (e.g. for st.write_stream)."""
+  return cached_stream(clients.openai_client(), **_final_request(summaries_text))
 
 # if __name__ == "__main__":
 #   final_output = synthesize_final_narratives(all_chunks_text)
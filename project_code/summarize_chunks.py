@@ -1,17 +1,12 @@
-import openai
 import pandas as pd
 import os
-from dotenv import load_dotenv
 from pathlib import Path
-
-# Load environment variables
-load_dotenv()
-
-client = openai.OpenAI()
+from project_code.chunking import chunk_frame
+from project_code.clustering import CLUSTER_NOTE, USE_CLUSTERING, cluster_note, condense_posts
+from project_code.llm_scheduler import LLMScheduler
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # go up to project root
 OUTPUT_DIR = BASE_DIR / "output"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 CLEAN_CSV    = OUTPUT_DIR / "forumscout_cleaned_data.csv"
 CHUNKS_MD    = OUTPUT_DIR / "gpt_narrative_summary.md"
 
@@ -19,30 +14,39 @@ def generate_chunked_summaries(
     # === CONFIGURATION ===
   INPUT_FILE = str(CLEAN_CSV),
   OUTPUT_FILE = str(CHUNKS_MD),
-  CHUNK_SIZE = 20,
-  OPENAI_MODEL = "gpt-4o-mini"
+  CHUNK_TOKENS = None, # post tokens per chunk; defaults to the model's budget
+  OPENAI_MODEL = "gpt-4o-mini",
   # OPENAI_MODEL = "gpt-3_5-turbo-instruct"
+  CLUSTER = None, # embed + k-means pre-pass (defaults to SUMMARY_CLUSTERING)
+  on_summary = None # on_summary(chunk index, summary) as each chunk finishes, in completion order
 ):
 
   # === Load and clean data ===
   df = pd.read_csv(INPUT_FILE) # Loads csv file of cleaned data into dataframe
   df = df[df["cleaned_caption"].notnull() & df["cleaned_caption"].str.strip().ne("")] # Removes rows where cleaned_caption is NaN or empty
 
+  # Optionally keep only a few representative posts per cluster
+  cols = ["cleaned_caption", "author", "url"]
+  if USE_CLUSTERING if CLUSTER is None else CLUSTER:
+    df = condense_posts(df)
+    if "cluster_size" in df.columns:
+      cols.append("cluster_size")
+
   # Format posts for GPT prompt
-  posts = df[["cleaned_caption", "author", "url"]].to_dict(orient="records")
+  def format_post(p):
+    return f"- @{p['author']}: \"{p['cleaned_caption'].strip()}\" ({p['url']}){cluster_note(p)}"
+
+  # Pack posts into chunks that fit the model's token budget (counts cached on df)
+  chunks = [
+    chunk[cols].to_dict(orient="records")
+    for chunk in chunk_frame(df, OPENAI_MODEL, CHUNK_TOKENS, format_post=format_post)
+  ]
 
-  # Generator function: yields slices of post list
-  def chunk_posts(posts, size):
-    
-    for i in range(0, len(posts), size):
-      yield posts[i:i + size]
-    
   # === OpenAI helper ===
   def format_prompt(post_chunk):
-    formatted = "\n".join([
-        f"- @{p['author']}: \"{p['cleaned_caption'].strip()}\" ({p['url']})"
-        for p in post_chunk
-    ])
+    formatted = "\n".join([format_post(p) for p in post_chunk])
+    if any(cluster_note(p) for p in post_chunk):
+      formatted = CLUSTER_NOTE + "\n  " + formatted
     prompt = f""" 
   You are a social media analyst reviewing Instagram captions about humanitarian and political issues in Gaza.
   Your job is to:
@@ -58,8 +62,8 @@ def generate_chunked_summaries(
     return prompt
 
   # === Summarize with GPT ===
-  def summarize_chunk(prompt):
-    response = client.chat.completions.create(
+  def summarize_chunk_request(prompt):
+    return dict(
       model=OPENAI_MODEL,
       messages=[
         {"role": "system", "content": "You are a skilled narrative analyst for social media."},
@@ -67,18 +71,14 @@ def generate_chunked_summaries(
       ],
       temperature=0.4 # Keeps output factual and consistent
     )
-    return response.choices[0].message.content # Extracts assistant's response
-
-  # === Process all chunks ===
-  all_summaries = []
 
-  for chunk in chunk_posts(posts, CHUNK_SIZE):
-    prompt = format_prompt(chunk)
-    print("Summarizing a chunk of", len(chunk), "posts...")
-    summary = summarize_chunk(prompt)
-    all_summaries.append(summary)
+  # === Process all chunks concurrently (results keep chunk order) ===
+  print(f"Summarizing {len(df)} posts in {len(chunks)} chunk(s) concurrently...")
+  requests = [summarize_chunk_request(format_prompt(chunk)) for chunk in chunks]
+  all_summaries = LLMScheduler().run(requests, on_result=on_summary)
 
   # === Save output ===
+  Path(OUTPUT_FILE).parent.mkdir(parents=True, exist_ok=True)
   with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
     print('len all summaries', len(all_summaries))
     for i, summary in enumerate(all_summaries):
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pandas as pd
+
+# Date formats seen across ForumScout, Apify and the Reddit/YouTube APIs.
+# Tried in order against one sample per string "shape" (digits -> 9).
+KNOWN_FORMATS = [
+    "%Y-%m-%dT%H:%M:%S.%fZ",
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+    "%a, %d %b %Y %H:%M:%S %z",
+    "%a %b %d %H:%M:%S %z %Y",
+]
+
+# shape -> matching format (or None when only the slow "mixed" parser works)
+_FORMAT_CACHE: dict[str, str | None] = {}
+
+def _format_for(shape: str, sample: str) -> str | None:
+    if shape not in _FORMAT_CACHE:
+        fmt = None
+        for candidate in KNOWN_FORMATS:
+            try:
+                datetime.strptime(sample, candidate)
+                fmt = candidate
+                break
+            except ValueError:
+                continue
+        _FORMAT_CACHE[shape] = fmt
+    return _FORMAT_CACHE[shape]
+
+def parse_timestamps_utc(values) -> pd.Series:
+    """
+    Parse a column of mixed date values into datetime64[ns, UTC].
+    Numbers are Unix epochs (seconds, or milliseconds when >= 1e12), decided per
+    value; strings are grouped by shape and parsed with one cached format per group.
+    Unparseable values become NaT.
+    """
+    s = pd.Series(values)
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns, UTC]")
+    if s.empty:
+        return out
+    if isinstance(s.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return pd.to_datetime(s, utc=True, errors="coerce").astype("datetime64[ns, UTC]")
+
+    num = pd.to_numeric(s, errors="coerce")
+    is_num = num.notna()
+    if is_num.any():
+        secs = num[is_num]
+        secs = secs.where(secs < 1e12, secs / 1000.0)
+        out[is_num] = pd.to_datetime(secs, unit="s", utc=True, errors="coerce")
+
+    text = s[~is_num & s.notna()].astype(str).str.strip()
+    text = text[text.ne("")]
+    if text.empty:
+        return out
+
+    shapes = text.str.replace(r"\d", "9", regex=True)
+    for shape, idx in shapes.groupby(shapes).groups.items():
+        group = text.loc[idx]
+        fmt = _format_for(shape, group.iloc[0])
+        out[idx] = pd.to_datetime(group, format=fmt or "mixed", utc=True, errors="coerce")
+    return out
+
+def ensure_posted_at(df: pd.DataFrame, source_col: str = "timestamp") -> pd.DataFrame:
+    """
+    Make sure `df` has a typed `posted_at` (datetime64[ns, UTC]) column, parsing it
+    from an existing string `posted_at` (e.g. read back from CSV) or from `source_col`.
+    """
+    if df is None:
+        return df
+    if "posted_at" in df.columns:
+        if isinstance(df["posted_at"].dtype, pd.DatetimeTZDtype):
+            return df
+        df = df.copy()
+        df["posted_at"] = parse_timestamps_utc(df["posted_at"])
+    elif source_col in df.columns:
+        df = df.copy()
+        df["posted_at"] = parse_timestamps_utc(df[source_col])
+    return df
@@ -0,0 +1,93 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from project_code.timestamps import parse_timestamps_utc
+
+# High-water marks for incremental ingestion: for each (platform, keyword) we
+# remember the newest post timestamp and its URL.
+#   {"instagram|gaza": {"timestamp": "2025-01-01T00:00:00+00:00", "url": "https://..."}}
+# Rows whose source gave no date get a stand-in "now" timestamp at ingestion and
+# are flagged in SYNTHESIZED_COLUMN; they never move a watermark.
+SYNTHESIZED_COLUMN = "timestamp_synthesized"
+
+def mark_key(platform: str, keyword: str) -> str:
+    return f"{platform}|{keyword}"
+
+def load_watermarks(path) -> dict:
+    p = Path(path)
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[watermarks] Could not read {p} ({e}); starting fresh.")
+        return {}
+
+def save_watermarks(marks: dict, path):
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(marks, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(p)
+
+def _to_utc(value):
+    """Parse an ISO string or Unix epoch (s or ms) into a UTC Timestamp; None if unparseable."""
+    if value is None or pd.isna(value) or value == "":
+        return None
+    ts = parse_timestamps_utc([value]).iloc[0]
+    return None if pd.isna(ts) else ts
+
+def mark_timestamp(mark: dict | None):
+    """The watermark's timestamp as a UTC Timestamp, or None."""
+    return _to_utc((mark or {}).get("timestamp"))
+
+def is_new(record: dict, mark: dict | None) -> bool:
+    if not mark:
+        return True
+    if mark.get("url") and record.get("url") == mark["url"]:
+        return False
+    ts, mark_ts = _to_utc(record.get("timestamp")), _to_utc(mark.get("timestamp"))
+    if ts is None or mark_ts is None:
+        return True  # can't tell; history de-duplicates by URL
+    return ts > mark_ts
+
+def split_new(records: list, mark: dict | None):
+    """
+    Return (new_records, reached_known). `reached_known` is True once the page
+    contains the watermark URL, so callers can stop paging.
+    """
+    if not mark:
+        return list(records), False
+    reached = any(mark.get("url") and r.get("url") == mark["url"] for r in records)
+    return [r for r in records if is_new(r, mark)], reached
+
+def filter_new_rows(df: pd.DataFrame, marks: dict) -> pd.DataFrame:
+    """Drop rows of `df` that are not newer than their (platform, keyword) watermark."""
+    if df is None or df.empty or not marks:
+        return df
+    keep = [
+        is_new(row, marks.get(mark_key(row.get("platform", ""), row.get("keyword", ""))))
+        for row in df.to_dict(orient="records")
+    ]
+    return df[keep].reset_index(drop=True)
+
+def is_synthesized(record: dict) -> bool:
+    """True if the record's timestamp was made up at ingestion rather than reported by the source."""
+    return str(record.get(SYNTHESIZED_COLUMN)).strip().lower() in ("true", "1")
+
+def advance_watermarks(marks: dict, df: pd.DataFrame) -> dict:
+    """Move each (platform, keyword) watermark up to the newest real post time in `df`."""
+    marks = dict(marks)
+    if df is None or df.empty:
+        return marks
+    for row in df.to_dict(orient="records"):
+        key = mark_key(row.get("platform", ""), row.get("keyword", ""))
+        ts = None if is_synthesized(row) else _to_utc(row.get("timestamp"))
+        if ts is None:
+            continue
+        current = _to_utc((marks.get(key) or {}).get("timestamp"))
+        if current is None or ts > current:
+            marks[key] = {"timestamp": ts.isoformat(), "url": row.get("url") or ""}
+    return marks
@@ -0,0 +1,77 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class HostLimitedPool:
+    """
+    Thread pool where each task is tagged with a host and at most
+    `host_limits[host]` tasks for that host run at once (`default_limit` for
+    hosts not listed). Use as a context manager; `submit` returns a Future.
+
+    Tasks wait in a per-host queue and only reach the executor once their host
+    has a free slot, so a long queue for one slow host never ties up workers
+    that other hosts could use.
+    """
+
+    def __init__(self, host_limits: dict | None = None, max_workers: int = 16, default_limit: int = 4):
+        self.host_limits = dict(host_limits or {})
+        self.default_limit = default_limit
+        self._queues = {}   # host -> deque of (future, fn, args, kwargs) waiting for a slot
+        self._running = {}  # host -> tasks handed to the executor
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _limit(self, host: str) -> int:
+        return max(1, self.host_limits.get(host, self.default_limit))
+
+    def _dispatch(self, host: str):
+        """Hand queued tasks for `host` to the executor while it has free slots (lock held)."""
+        queue = self._queues[host]
+        while queue and self._running[host] < self._limit(host):
+            future, fn, args, kwargs = queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._running[host] += 1
+            self._executor.submit(self._run, host, future, fn, args, kwargs)
+
+    def _run(self, host: str, future: Future, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._running[host] -= 1
+                self._dispatch(host)
+                if not any(self._running.values()) and not any(self._queues.values()):
+                    self._idle.notify_all()
+
+    def submit(self, host: str, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            self._queues.setdefault(host, deque()).append((future, fn, args, kwargs))
+            self._running.setdefault(host, 0)
+            self._dispatch(host)
+        return future
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if wait:
+                # Queued tasks are dispatched by finishing ones, so drain them first
+                while any(self._running.values()) or any(self._queues.values()):
+                    self._idle.wait()
+            else:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft()[0].cancel()
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
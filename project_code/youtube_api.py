@@ -0,0 +1,89 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from project_code import http_client
+
+# YouTube Data API v3: videos.list accepts up to 50 comma-separated IDs and
+# costs 1 quota unit per call whatever the number of IDs or parts.
+VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+BATCH_SIZE = 50
+MAX_WORKERS = int(os.getenv("YOUTUBE_MAX_WORKERS", "4"))
+UNITS_PER_CALL = 1
+
+_quota = {"calls": 0, "units": 0}
+_quota_lock = threading.Lock()
+
+def extract_video_id(video_url: str) -> str | None:
+    match = re.search(r"(?:v=|youtu\.be/|/shorts/)([A-Za-z0-9_-]{11})", video_url or "")
+    return match.group(1) if match else None
+
+def quota_used() -> dict:
+    with _quota_lock:
+        return dict(_quota)
+
+def _video_info(item: dict) -> dict:
+    snippet = item.get("snippet") or {}
+    stats = item.get("statistics") or {}
+    return {
+        "title": snippet.get("title") or "",
+        "description": snippet.get("description") or "",
+        "channel": snippet.get("channelTitle") or "",
+        "view_count": stats.get("viewCount"),
+        "like_count": stats.get("likeCount"),
+        "comment_count": stats.get("commentCount"),
+    }
+
+def batched(video_ids) -> list:
+    """De-duplicated IDs split into videos.list-sized batches."""
+    ids = list(dict.fromkeys(v for v in video_ids if v))
+    return [ids[i:i + BATCH_SIZE] for i in range(0, len(ids), BATCH_SIZE)]
+
+def fetch_batch(ids: list, api_key: str | None = None) -> dict:
+    """
+    One videos.list call for up to 50 IDs; returns {id: info}, where IDs that are
+    absent no longer exist. Returns None if the call itself failed.
+    """
+    api_key = api_key or os.getenv("YOUTUBE_API_KEY")
+    if not api_key:
+        return None
+    params = {"part": "snippet,statistics", "id": ",".join(ids), "key": api_key, "maxResults": BATCH_SIZE}
+    with _quota_lock:
+        _quota["calls"] += 1
+        _quota["units"] += UNITS_PER_CALL
+    try:
+        resp = http_client.get(VIDEOS_URL, params=params)
+        resp.raise_for_status()
+        return {item["id"]: _video_info(item) for item in resp.json().get("items", [])}
+    except Exception as e:
+        print(f"❌ Failed to fetch YouTube batch of {len(ids)} video(s): {e}")
+        return None
+
+def fetch_videos(video_ids, api_key: str | None = None, max_workers: int = MAX_WORKERS, on_progress=None) -> dict:
+    """
+    Resolve video IDs to {id: {title, description, channel, view_count, like_count, comment_count}}
+    with one videos.list call per 50 IDs, run concurrently. Missing videos are absent.
+    `on_progress(done, total)` is called on the calling thread as each batch finishes,
+    counting unique IDs.
+    """
+    api_key = api_key or os.getenv("YOUTUBE_API_KEY")
+    if not api_key:
+        print("❌ YOUTUBE_API_KEY not set — skipping YouTube lookups")
+        return {}
+    batches = batched(video_ids)
+    if not batches:
+        return {}
+
+    results = {}
+    n_ids, done = sum(len(b) for b in batches), 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+        futures = {pool.submit(fetch_batch, b, api_key): len(b) for b in batches}
+        for future in as_completed(futures):
+            results.update(future.result() or {})
+            done += futures[future]
+            if on_progress is not None:
+                on_progress(done, n_ids)
+    print(f"YouTube: resolved {len(results)}/{n_ids} video(s) in {len(batches)} call(s) "
+          f"({len(batches) * UNITS_PER_CALL} quota units)")
+    return results
@@ -10,6 +10,10 @@ from email_project.email_fetch_captions import enrich_captions
 from project_code.caption_cleaning import clean_captions_file
 from email_project.email_summarize_chunks import generate_chunked_summaries
 from project_code.summaries import synthesize_final_narratives
+from project_code import http_client
+from project_code.enrichment_cache import USE_ENRICH_CACHE, get_enrichment_cache
+from project_code.llm_batch import USE_BATCH_MODE
+from project_code.llm_cache import get_llm_cache
 
 # -------- logging setup --------
 BASE_DIR = Path(__file__).resolve().parent
@@ -105,10 +109,30 @@ def _collect_attachments():
             out.append((name, path.read_bytes()))    
     return out
 
-def build_report(keywords, selected_platforms, sort_by=None, recency=None, attach_files=True):
+def _log_http_stats():
+    lines = http_client.format_stats()
+    if not lines:
+        logger.info("HTTP stats: no outbound requests")
+    for line in lines:
+        logger.info("HTTP stats | %s", line)
+
+def _log_enrichment_cache_stats():
+    if not USE_ENRICH_CACHE:
+        return
+    for line in get_enrichment_cache().format_stats():
+        logger.info("Enrichment cache | %s", line)
+
+def _log_llm_cache_stats():
+    cache = get_llm_cache()
+    if cache is None:
+        logger.info("LLM cache: disabled")
+        return
+    logger.info("LLM cache | %s", cache.format_stats())
+
+def build_report(keywords, selected_platforms, sort_by=None, recency=None, attach_files=True, incremental=False):
     logger.info("=== Weekly report run start ===")
-    logger.info("Inputs | keywords=%s | platforms=%s | sort_by=%s | recency=%s",
-                keywords, selected_platforms, sort_by, recency)
+    logger.info("Inputs | keywords=%s | platforms=%s | sort_by=%s | recency=%s | incremental=%s",
+                keywords, selected_platforms, sort_by, recency, incremental)
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -137,7 +161,7 @@ def build_report(keywords, selected_platforms, sort_by=None, recency=None, attac
     # 1) Ingest
     try:
         logger.info("Step 1: run_ingestion started")
-        run_ingestion(keywords=keywords, endpoints=endpoints, sort_by='Latest', recency=recency)
+        run_ingestion(keywords=keywords, endpoints=endpoints, sort_by='Latest', recency=recency, incremental=incremental)
         logger.info("Step 1: run_ingestion finished")
     except Exception as e:
         logger.exception("Error during ingestion")
@@ -150,6 +174,7 @@ def build_report(keywords, selected_platforms, sort_by=None, recency=None, attac
         if RAW_CSV.exists():
             enrich_captions(str(RAW_CSV), str(CAPTIONS_CSV))
             logger.info("Step 2: enrich_captions finished")
+            _log_enrichment_cache_stats()
         else:
             logger.warning("Step 2 skipped: Raw CSV not found")
     except Exception:
@@ -172,6 +197,7 @@ def build_report(keywords, selected_platforms, sort_by=None, recency=None, attac
         CLEAN_CSV.write_text("error during cleaning")
 
     clean_info = _df_summary(CLEAN_CSV, "Cleaned CSV")
+    _log_http_stats()
     skip_openai = False
 
     if "⚠️" in clean_info or "❌" in clean_info:
@@ -197,7 +223,7 @@ def build_report(keywords, selected_platforms, sort_by=None, recency=None, attac
       return "<p>No data to summarize this week.</p>", _collect_attachments()
     else:
       try:
-          logger.info("Step 4: generate_chunked_summaries started")
+          logger.info("Step 4: generate_chunked_summaries started | batch_mode=%s", USE_BATCH_MODE)
           summaries = generate_chunked_summaries()
           with open(CHUNKS_MD, "w", encoding="utf-8") as f:
               for s in summaries:
@@ -207,6 +233,7 @@ def build_report(keywords, selected_platforms, sort_by=None, recency=None, attac
           logger.exception("Error generating chunked summaries")
           with open(CHUNKS_MD, "w", encoding="utf-8") as f:
               f.write("[No summaries generated due to error]\n")
+      _log_llm_cache_stats()
 
       # 5) Final narratives
     #   try:
@@ -14,6 +14,7 @@ def main():
     platforms = _env_list("REPORT_PLATFORMS")
     sort_by = os.environ.get("REPORT_SORT_BY")      # "Latest" | "Most Popular" | None
     recency = os.environ.get("REPORT_RECENCY")      # "last_hour"|"today"|"this_week"|"this_month"|"this_year"|None
+    incremental = os.environ.get("REPORT_INCREMENTAL", "0") == "1"  # only fetch posts newer than last run
 
     html, attachments = build_report(
         keywords=keywords,
@@ -21,6 +22,7 @@ def main():
         sort_by=sort_by,
         recency=recency,
         attach_files=True,
+        incremental=incremental,
     )
 
     from_addr = os.environ["GMAIL_USERNAME"]
@@ -3,7 +3,7 @@ from project_code.forum_scout_multiple import run_ingestion
 from project_code.fetch_captions import enrich_captions
 from project_code.caption_cleaning import clean_captions_file
 from project_code.summarize_chunks import generate_chunked_summaries
-from project_code.summaries import synthesize_final_narratives
+from project_code.summaries import stream_final_narratives
 from utils.logger import log_to_browser
 import os
 from datetime import datetime
@@ -231,12 +231,21 @@ if st.session_state.cleaning_complete:
             st.warning("Cleaned data file not found")
 
     if st.button("💡 Generate Summaries"):
-        # Generate summaries
+        # Generate summaries, showing each chunk as soon as it finishes
+        live_summaries = st.empty()
+        live_box = live_summaries.container()
+
+        def show_summary(i, summary):
+            with live_box:
+                st.markdown(f"### Chunk Summary {i+1}")
+                st.markdown(summary)
+
         with st.spinner("Generating summaries from content..."):
             try: 
-                summaries = generate_chunked_summaries()
+                summaries = generate_chunked_summaries(on_summary=show_summary)
                 chunk_count = len(summaries)
                 st.session_state.summaries = summaries
+                live_summaries.empty()
                 st.success("Chunked summaries generated!")
             except Exception as e:
                 st.error(f"Error generating summaries by chunk: {e}. Check https://platform.openai.com/settings/organization/billing/overview to ensure we have enough in our OpenAI API billing.")
@@ -271,9 +280,13 @@ if st.session_state.cleaning_complete:
                 # with open("output/gpt_narrative_summary.md", "r", encoding="utf-8") as f:
                 #     all_chunks_text = f.read()
 
+                # Stream the final narratives token by token
+                live_final = st.empty()
                 with st.spinner("Analyzing summaries and generating final narratives..."):
                     try: 
-                        final_output = synthesize_final_narratives(all_chunks_text)
+                        with live_final.container():
+                            final_output = st.write_stream(stream_final_narratives(all_chunks_text))
+                        live_final.empty()
                         st.session_state.final_narratives = final_output
                         st.session_state.analysis_complete = True
                         st.success("Analysis complete!")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the pipeline modules the same way the app and report scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
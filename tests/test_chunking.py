@@ -0,0 +1,65 @@
+import pandas as pd
+
+from project_code import chunking
+from project_code.chunking import add_token_counts, chunk_budget, chunk_frame, count_tokens, pack_chunks
+
+
+def _flat(chunks):
+    return [i for chunk in chunks for i in chunk]
+
+
+def test_pack_chunks_respects_budget_and_order():
+    counts = [300, 500, 200, 700, 100, 400, 600, 50]
+    chunks = pack_chunks(counts, 1000)
+    assert _flat(chunks) == list(range(len(counts)))
+    assert all(sum(counts[i] for i in chunk) <= 1000 for chunk in chunks)
+
+
+def test_pack_chunks_spreads_tokens_evenly():
+    # 1100 tokens fit in two chunks; greedy filling would leave 1000 + 100
+    chunks = pack_chunks([100] * 11, 1000)
+    assert [len(c) for c in chunks] == [6, 5]
+
+
+def test_pack_chunks_oversized_post_gets_own_chunk():
+    chunks = pack_chunks([100, 5000, 100], 1000)
+    assert chunks == [[0], [1], [2]]
+
+
+def test_pack_chunks_empty():
+    assert pack_chunks([], 1000) == []
+
+
+def test_count_tokens_fallback_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(chunking, "_encoding", lambda model: None)
+    assert count_tokens(["", "abcd" * 10], "gpt-4o-mini") == [1, 10]
+
+
+def test_add_token_counts_only_counts_missing_rows(monkeypatch):
+    seen = []
+
+    def fake_count(texts, model):
+        seen.extend(texts)
+        return [len(t) for t in texts]
+
+    monkeypatch.setattr(chunking, "count_tokens", fake_count)
+    df = pd.DataFrame({"cleaned_caption": ["aa", "bbbb"], "n_tokens": [7, pd.NA]})
+    df = add_token_counts(df, "gpt-4o-mini")
+    assert seen == ["bbbb"]
+    assert df["n_tokens"].tolist() == [7, 4]
+
+
+def test_chunk_frame_splits_frame(monkeypatch):
+    monkeypatch.setattr(chunking, "_encoding", lambda model: None)
+    df = pd.DataFrame({"cleaned_caption": ["x" * 400] * 5})  # 100 tokens each
+    chunks = chunk_frame(df, "gpt-4o-mini", budget=250)
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert chunk_frame(df.iloc[0:0], "gpt-4o-mini") == []
+
+
+def test_chunk_budget_override(monkeypatch):
+    monkeypatch.delenv("CHUNK_TOKEN_BUDGET", raising=False)
+    assert chunk_budget("gpt-4") == 4000
+    assert chunk_budget("unknown-model") == chunking.DEFAULT_CHUNK_TOKENS
+    monkeypatch.setenv("CHUNK_TOKEN_BUDGET", "123")
+    assert chunk_budget("gpt-4") == 123
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from project_code import embedding_store
+from project_code.embedding_store import EmbeddingStore
+
+def _vectors(n, dim=8, seed=0):
+    X = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+def _interrupt_index_write(monkeypatch):
+    """Make the next add() die after its vectors are written but before its index lines are."""
+    real = embedding_store._write_at
+
+    def flaky(path, offset, payload):
+        if path.name == "index.jsonl":
+            raise OSError("disk full")
+        real(path, offset, payload)
+
+    monkeypatch.setattr(embedding_store, "_write_at", flaky)
+    return lambda: monkeypatch.setattr(embedding_store, "_write_at", real)
+
+def test_add_get_and_reopen(tmp_path):
+    X = _vectors(5)
+    store = EmbeddingStore(tmp_path, model="m")
+    assert store.add([f"p{i}" for i in range(5)], X) == 5
+    assert store.add(["p0", "p1"], X[:2]) == 0
+    reopened = EmbeddingStore(tmp_path, model="m")
+    assert len(reopened) == 5
+    np.testing.assert_allclose(reopened.get(["p3", "p1"]), X[[3, 1]], rtol=1e-6)
+
+def test_model_mismatch_raises(tmp_path):
+    EmbeddingStore(tmp_path, model="m").add(["p"], _vectors(1))
+    with pytest.raises(ValueError):
+        EmbeddingStore(tmp_path, model="other")
+
+def test_interrupted_add_does_not_misalign_rows(tmp_path, monkeypatch):
+    X = _vectors(6)
+    store = EmbeddingStore(tmp_path, model="m")
+    store.add(["a", "b"], X[:2])
+
+    restore = _interrupt_index_write(monkeypatch)
+    with pytest.raises(OSError):
+        store.add(["orphan1", "orphan2"], X[2:4])
+    restore()
+    assert "orphan1" not in store
+
+    # Same session: the next append must not be indexed onto the orphan vectors
+    store.add(["c", "d"], X[4:6])
+    np.testing.assert_allclose(store.get(["a", "b", "c", "d"]), X[[0, 1, 4, 5]], rtol=1e-6)
+
+    reopened = EmbeddingStore(tmp_path, model="m")
+    np.testing.assert_allclose(reopened.get(["a", "b", "c", "d"]), X[[0, 1, 4, 5]], rtol=1e-6)
+    assert (tmp_path / "vectors.f32").stat().st_size == 4 * 4 * 8
+
+def test_orphan_vectors_truncated_on_open(tmp_path):
+    X = _vectors(4)
+    EmbeddingStore(tmp_path, model="m").add(["a", "b"], X[:2])
+    # Simulate a crash between the vector write and the index write (plus a torn row)
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(X[2:4].tobytes() + b"\x00\x01")
+
+    store = EmbeddingStore(tmp_path, model="m")
+    assert len(store) == 2
+    assert (tmp_path / "vectors.f32").stat().st_size == 2 * 4 * 8
+    store.add(["c"], X[3:4])
+    np.testing.assert_allclose(EmbeddingStore(tmp_path, model="m").get(["c"]), X[3:4], rtol=1e-6)
+
+def test_torn_index_line_is_dropped(tmp_path):
+    X = _vectors(3)
+    EmbeddingStore(tmp_path, model="m").add(["a", "b"], X[:2])
+    with open(tmp_path / "index.jsonl", "ab") as f:
+        f.write(b'{"id": "c')
+    store = EmbeddingStore(tmp_path, model="m")
+    assert store.ids == ["a", "b"]
+    store.add(["c"], X[2:3])
+    assert EmbeddingStore(tmp_path, model="m").ids == ["a", "b", "c"]
+
+def test_top_k_matches_brute_force_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_store, "QUERY_BLOCK_ROWS", 7)
+    X = _vectors(50, seed=1)
+    store = EmbeddingStore(tmp_path, model="m")
+    store.add([f"p{i}" for i in range(50)], X)
+    Q = _vectors(4, seed=2)
+    rows, scores = store.top_k(Q, k=5)
+    expected = np.argsort(-(Q @ X.T), axis=1)[:, :5]
+    np.testing.assert_array_equal(rows, expected)
+    assert np.all(np.diff(scores, axis=1) <= 1e-6)
+
+def test_similar_excludes_the_query_itself(tmp_path):
+    X = _vectors(10, seed=3)
+    store = EmbeddingStore(tmp_path, model="m")
+    store.add([f"p{i}" for i in range(10)], X)
+    for pid, neighbours in zip(["p0", "p5"], store.similar(["p0", "p5"], k=3)):
+        assert len(neighbours) == 3
+        assert pid not in [n for n, _ in neighbours]
+
+def test_empty_store_top_k(tmp_path):
+    rows, scores = EmbeddingStore(tmp_path, model="m").top_k(_vectors(2), k=3)
+    assert rows.shape == (2, 0) and scores.shape == (2, 0)
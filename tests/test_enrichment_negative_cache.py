@@ -0,0 +1,63 @@
+import csv
+from types import SimpleNamespace
+
+import pytest
+
+from email_project import email_fetch_captions as efc
+from project_code.enrichment_cache import EnrichmentCache
+
+def _response(status, payload=None):
+    def raise_for_status():
+        if status >= 400:
+            raise RuntimeError(f"HTTP {status}")
+    return SimpleNamespace(status_code=status, json=lambda: payload, raise_for_status=raise_for_status)
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_reddit_comment_transient_errors_are_failures(monkeypatch, status):
+    monkeypatch.setattr(efc.http_client, "get", lambda *a, **k: _response(status))
+    assert efc.fetch_reddit_comment("https://reddit.com/r/x/comments/abc/t/def") is efc.FETCH_FAILED
+
+def test_reddit_comment_connection_error_is_failure(monkeypatch):
+    def boom(*a, **k):
+        raise ConnectionError("reset")
+    monkeypatch.setattr(efc.http_client, "get", boom)
+    assert efc.fetch_reddit_comment("https://reddit.com/r/x/comments/abc/t/def") is efc.FETCH_FAILED
+
+def test_reddit_comment_not_found(monkeypatch):
+    monkeypatch.setattr(efc.http_client, "get", lambda *a, **k: _response(404))
+    assert efc.fetch_reddit_comment("https://reddit.com/r/x/comments/abc/t/def") is efc.NOT_FOUND
+    empty = [{}, {"data": {"children": []}}]
+    monkeypatch.setattr(efc.http_client, "get", lambda *a, **k: _response(200, empty))
+    assert efc.fetch_reddit_comment("https://reddit.com/r/x/comments/abc/t/def") is efc.NOT_FOUND
+
+def test_to_entry():
+    assert efc._to_entry("instagram", efc.FETCH_FAILED) is None
+    assert efc._to_entry("instagram", efc.NOT_FOUND) == {"caption": "", "missing": True}
+    assert efc._to_entry("instagram", None) == {"caption": ""}
+    assert efc._to_entry("reddit_posts", ("t", "b")) == {"caption": "t", "body": "b"}
+
+def _run(tmp_path, monkeypatch, result):
+    cache = EnrichmentCache(tmp_path / "enrich.sqlite")
+    monkeypatch.setattr(efc, "get_enrichment_cache", lambda: cache)
+    monkeypatch.setattr(efc, "fetch_instagram_captions", lambda shortcode: result)
+    src, out = tmp_path / "in.csv", tmp_path / "out.csv"
+    with open(src, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["platform", "url", "content"])
+        writer.writeheader()
+        writer.writerow({"platform": "instagram", "url": "https://www.instagram.com/p/ABC123/", "content": ""})
+    efc.enrich_captions(str(src), str(out), use_cache=True)
+    return cache, list(csv.DictReader(open(out, encoding="utf-8")))
+
+def test_transient_failure_is_not_cached(tmp_path, monkeypatch):
+    cache, rows = _run(tmp_path, monkeypatch, efc.FETCH_FAILED)
+    assert rows[0]["caption"] == ""
+    assert cache.lookup("instagram", "https://instagram.com/p/ABC123") is None
+
+def test_confirmed_not_found_is_cached_as_missing(tmp_path, monkeypatch):
+    cache, _ = _run(tmp_path, monkeypatch, efc.NOT_FOUND)
+    assert cache.lookup("instagram", "https://instagram.com/p/ABC123")["missing"] is True
+
+def test_caption_is_cached(tmp_path, monkeypatch):
+    cache, rows = _run(tmp_path, monkeypatch, "hello")
+    assert rows[0]["caption"] == "hello"
+    assert cache.lookup("instagram", "https://instagram.com/p/ABC123")["caption"] == "hello"
@@ -0,0 +1,63 @@
+import threading
+
+import pandas as pd
+
+from project_code import clients, fetch_captions, youtube_api
+
+
+class _Streamlit:
+    """Records progress bar updates and wakes anyone waiting on them."""
+
+    def __init__(self):
+        self.events = []
+        self.changed = threading.Condition()
+
+    def update(self, value):
+        with self.changed:
+            self.events.append(("progress", value))
+            self.changed.notify_all()
+
+    def empty(self):
+        self.events.append(("empty", None))
+
+
+def _video_id(n):
+    return f"vid{n:08d}"  # 11 characters, like a real ID
+
+
+def test_youtube_progress_follows_batches(tmp_path, monkeypatch):
+    st = _Streamlit()
+    bar = type("Bar", (), {"progress": lambda self, value, text=None: st.update(value),
+                           "empty": lambda self: st.empty()})()
+    monkeypatch.setattr(clients, "streamlit", lambda: type("St", (), {"progress": lambda self, v, text=None: bar})())
+    monkeypatch.setenv("YOUTUBE_API_KEY", "test")
+    calls = []
+
+    def fake_batch(ids, api_key=None):
+        # Each call waits (briefly) until the bar shows the previous one, so the
+        # event order is deterministic when progress is reported per batch
+        with st.changed:
+            st.changed.wait_for(lambda: len(st.events) >= 2 * len(calls), timeout=1)
+            calls.append(ids)
+            st.events.append(("batch", len(ids)))
+        return {v: {"title": f"title {v}", "description": "d", "view_count": "7"} for v in ids if v != _video_id(3)}
+
+    monkeypatch.setattr(youtube_api, "fetch_batch", fake_batch)
+
+    rows = [{"platform": "youtube", "url": f"https://youtu.be/{_video_id(n)}", "content": ""} for n in range(120)]
+    rows.append({"platform": "instagram", "url": "https://instagram.com/p/x", "content": "caption"})
+    src, dst = tmp_path / "in.csv", tmp_path / "out.csv"
+    pd.DataFrame(rows).to_csv(src, index=False)
+    fetch_captions.enrich_captions(str(src), str(dst))
+
+    # The bar moves after each finished videos.list call, not all at once at the end
+    assert [kind for kind, _ in st.events] == ["batch", "progress"] * 3 + ["empty"]
+    sizes = [n for kind, n in st.events if kind == "batch"]
+    assert sorted(sizes) == [20, 50, 50]
+    done = [sum(sizes[:k + 1]) / 120 for k in range(3)]
+    assert [v for kind, v in st.events if kind == "progress"] == done
+
+    out = pd.read_csv(dst, dtype=str, keep_default_na=False)
+    assert out.loc[0, "caption"] == f"title {_video_id(0)}" and out.loc[0, "view_count"] == "7"
+    assert out.loc[3, "caption"] == ""  # missing video
+    assert out.loc[120, "caption"] == "caption"
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from project_code import fetch_tiktok_data as tiktok
+
+
+class _Dataset:
+    def __init__(self, items):
+        self.items = items
+        self.offsets = []
+
+    def list_items(self, offset, limit, fields=None, flatten=None):
+        self.offsets.append(offset)
+        return SimpleNamespace(items=self.items[offset:offset + limit])
+
+
+class _Client:
+    def __init__(self, items):
+        self.dataset_ = _Dataset(items)
+        self.run_inputs = []
+
+    def actor(self, actor_id):
+        def call(run_input):
+            self.run_inputs.append(run_input)
+            return {"defaultDatasetId": "ds"}
+        return SimpleNamespace(call=call)
+
+    def dataset(self, dataset_id):
+        return self.dataset_
+
+
+def _item(n, tag=None, when="2025-06-01T00:00:00Z"):
+    item = {"text": f"post {n}", "createTimeISO": when, "webVideoUrl": f"https://tiktok.com/v/{n}"}
+    if tag is not None:
+        item["searchHashtag.name"] = tag
+    return item
+
+
+def test_unmatched_hashtag_goes_to_first_keyword():
+    assert tiktok._item_keyword(_item(1, "Ceasefire"), ["gaza", "ceasefire"]) == "ceasefire"
+    assert tiktok._item_keyword(_item(2), ["gaza", "ceasefire"]) == "gaza"
+    assert tiktok._item_keyword(_item(3, "other"), ["gaza", "ceasefire"]) == "gaza"
+
+
+def test_unmatched_items_count_against_first_keyword_cap():
+    items = [_item(1, "gaza"), _item(2), _item(3, "other"), _item(4, "ceasefire")]
+    rows = tiktok._run_batch(_Client(items), ["gaza", "ceasefire"], "latest", max_items=2)
+    assert [(r["keyword"], r["url"][-1]) for r in rows] == [("gaza", "1"), ("gaza", "2"), ("ceasefire", "4")]
+
+
+def test_unmatched_items_use_first_keyword_cutoff():
+    items = [_item(1, when="2025-01-01T00:00:00Z"), _item(2, when="2025-06-01T00:00:00Z")]
+    since = {"gaza": "2025-03-01", "ceasefire": "2020-01-01"}
+    rows = tiktok._run_batch(_Client(items), ["gaza", "ceasefire"], "latest", since=since)
+    assert [r["url"][-1] for r in rows] == ["2"]
+
+
+def test_paging_stops_once_every_keyword_is_capped(monkeypatch):
+    monkeypatch.setattr(tiktok, "PAGE_SIZE", 2)
+    client = _Client([_item(n, "gaza") for n in range(10)])
+    rows = tiktok._run_batch(client, ["gaza"], "latest", max_items=3)
+    assert len(rows) == 3
+    assert client.dataset_.offsets == [0, 2]
+
+
+def test_stale_page_stops_paging_only_for_latest(monkeypatch):
+    monkeypatch.setattr(tiktok, "PAGE_SIZE", 2)
+    items = [_item(1, when="2025-01-01T00:00:00Z"), _item(2, when="2025-01-02T00:00:00Z"),
+             _item(3, when="2025-06-01T00:00:00Z"), _item(4, when="2025-01-03T00:00:00Z")]
+    since = "2025-03-01"
+
+    latest = _Client(items)
+    assert tiktok._run_batch(latest, ["gaza"], "latest", since=since) == []
+    assert latest.dataset_.offsets == [0]
+
+    popular = _Client(items)
+    rows = tiktok._run_batch(popular, ["gaza"], "popular", since=since)
+    assert [r["url"][-1] for r in rows] == ["3"]
+    assert popular.dataset_.offsets == [0, 2, 4]
@@ -0,0 +1,109 @@
+import io
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from project_code import http_client
+
+NOW = 1_750_000_000.0
+URL = "https://api.example.com/items"
+
+
+def _response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(b"{}")
+    return response
+
+
+class _Session:
+    """Hands out scripted outcomes in order: a status code, (status, headers) or an exception."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, None)
+        return _response(status, headers)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    fake_time = SimpleNamespace(sleep=waits.append, monotonic=time.monotonic, time=lambda: NOW)
+    monkeypatch.setattr(http_client, "time", fake_time)
+    http_client.reset_stats()
+    yield waits
+    http_client.reset_stats()
+
+
+def _use(monkeypatch, session):
+    monkeypatch.setattr(http_client, "get_session", lambda host: session)
+    return session
+
+
+def test_429_honours_retry_after_seconds(monkeypatch, sleeps):
+    session = _use(monkeypatch, _Session((429, {"Retry-After": "7"}), 200))
+    assert http_client.get(URL).status_code == 200
+    assert sleeps == [7.0]
+    assert session.calls == 2
+
+
+def test_429_honours_retry_after_http_date(monkeypatch, sleeps):
+    when = format_datetime(datetime.fromtimestamp(NOW, timezone.utc) + timedelta(seconds=30), usegmt=True)
+    _use(monkeypatch, _Session((429, {"Retry-After": when}), 200))
+    assert http_client.get(URL).status_code == 200
+    assert sleeps == [pytest.approx(30.0)]
+
+
+def test_retry_after_is_capped(monkeypatch, sleeps):
+    _use(monkeypatch, _Session((503, {"Retry-After": "3600"}), 200))
+    http_client.get(URL)
+    assert sleeps == [http_client.BACKOFF_MAX]
+
+
+def test_5xx_retried_with_backoff_then_returned(monkeypatch, sleeps):
+    monkeypatch.setattr(http_client, "BACKOFF_BASE", 1.0)
+    session = _use(monkeypatch, _Session(500, 502, 503))
+    response = http_client.request("GET", URL, max_retries=2)
+    assert response.status_code == 503  # last response is handed back for the caller to check
+    assert session.calls == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1.0 and 0 <= sleeps[1] <= 2.0
+
+
+def test_non_retryable_status_returned_at_once(monkeypatch, sleeps):
+    session = _use(monkeypatch, _Session(404))
+    assert http_client.get(URL).status_code == 404
+    assert session.calls == 1 and sleeps == []
+
+
+def test_connection_errors_exhaust_retries(monkeypatch, sleeps):
+    errors = [requests.ConnectionError("down"), requests.Timeout("slow"), requests.ConnectionError("down")]
+    session = _use(monkeypatch, _Session(*errors))
+    with pytest.raises(requests.ConnectionError):
+        http_client.request("GET", URL, max_retries=2)
+    assert session.calls == 3 and len(sleeps) == 2
+
+
+def test_stats_counters(monkeypatch, sleeps):
+    _use(monkeypatch, _Session((429, {"Retry-After": "0"}), 200, 404, requests.ConnectionError("down"), 500))
+    http_client.get(URL)                    # one retry, then success
+    http_client.get(URL)                    # 404 counts as a failure
+    http_client.request("GET", URL, max_retries=1)  # connection error retried, then a final 500
+    stats = http_client.get_stats()["api.example.com"]
+    assert stats["requests"] == 5
+    assert stats["retries"] == 2
+    assert stats["failures"] == 2
+    assert stats["max_s"] >= 0 and stats["total_s"] >= 0
+    assert http_client.format_stats()[0].startswith("api.example.com: requests=5 retries=2 failures=2")
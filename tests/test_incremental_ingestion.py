@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+from project_code import forum_scout_multiple as fsm
+from project_code import watermarks
+
+
+def _iso(days_ago):
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).isoformat()
+
+
+def test_undated_post_is_flagged_and_never_advances_watermark():
+    dated = fsm.normalize_result({"url": "https://x/1", "date": _iso(2)}, "instagram", "gaza")
+    undated = fsm.normalize_result({"url": "https://x/2"}, "instagram", "gaza")
+    assert not dated[watermarks.SYNTHESIZED_COLUMN]
+    assert undated[watermarks.SYNTHESIZED_COLUMN] and undated["timestamp"]
+
+    df = fsm.records_to_frame([dated, undated])
+    marks = watermarks.advance_watermarks({}, df)
+    assert marks["instagram|gaza"]["url"] == "https://x/1"
+
+    only_undated = watermarks.advance_watermarks({}, fsm.records_to_frame([undated]))
+    assert only_undated == {}
+
+
+def test_merge_history_dedupes_on_platform_and_url(tmp_path):
+    history = tmp_path / "history.csv"
+    first = fsm.records_to_frame([
+        {"platform": "instagram", "keyword": "gaza", "url": "https://x/1", "content": "old", "timestamp": _iso(3)},
+    ])
+    fsm.merge_history(first, history)
+    second = fsm.records_to_frame([
+        {"platform": "instagram", "keyword": "ceasefire", "url": "https://x/1", "content": "new", "timestamp": _iso(3)},
+        {"platform": "reddit", "keyword": "gaza", "url": "https://x/1", "content": "other", "timestamp": _iso(3)},
+    ])
+    merged = fsm.merge_history(second, history)
+    assert len(merged) == 2
+    instagram = merged[merged["platform"] == "instagram"]
+    assert instagram["content"].tolist() == ["new"]
+
+
+def _paged(pages):
+    calls = []
+
+    def fetch(endpoint, keyword, sort_by=None, recency=None, use_cache=None, limiter=None, page=None):
+        calls.append(page)
+        return pages[page - 1] if page <= len(pages) else []
+    return fetch, calls
+
+
+def test_stale_page_stops_paging_only_for_latest(monkeypatch):
+    mark = {"timestamp": _iso(5), "url": "https://x/known"}
+    pages = [
+        [{"url": "https://x/a", "date": _iso(10)}],  # older than the mark
+        [{"url": "https://x/b", "date": _iso(1)}],
+    ]
+    fetch, calls = _paged(pages)
+    monkeypatch.setattr(fsm, "fetch_forumscout_data", fetch)
+    records = fsm._ingest_forumscout("instagram", "ep", "gaza", None, None, None, False,
+                                     mark=mark, incremental=True, newest_first=True)
+    assert records == [] and calls == [1]
+
+    fetch, calls = _paged(pages)
+    monkeypatch.setattr(fsm, "fetch_forumscout_data", fetch)
+    records = fsm._ingest_forumscout("instagram", "ep", "gaza", "relevance", None, None, False,
+                                     mark=mark, incremental=True, newest_first=False)
+    assert [r["url"] for r in records] == ["https://x/b"]
+    assert calls == [1, 2, 3]
@@ -0,0 +1,151 @@
+import json
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from project_code.batch_stub_server import serve
+from project_code.llm_batch import BatchRunner, parse_batch_output, write_batch_file
+from project_code.llm_cache import LLMCache
+
+
+def _request(prompt):
+    return {"model": "m", "messages": [{"role": "user", "content": prompt}]}
+
+
+def _echo(body):
+    prompt = body["messages"][0]["content"]
+    if prompt.startswith("fail"):
+        raise RuntimeError("no answer")
+    return f"echo:{prompt}"
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(responder=_echo, delay=0.0):
+        server, base_url = serve(responder=responder, delay=delay)
+        servers.append(server)
+        return lambda: openai.OpenAI(base_url=base_url, api_key="stub", max_retries=0)
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+class _Fallback:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, requests, accept=None):
+        self.calls.append(([r["messages"][0]["content"] for r in requests], accept))
+        return [f"sync:{r['messages'][0]['content']}" for r in requests]
+
+
+def _runner(client_factory, tmp_path, **kwargs):
+    kwargs.setdefault("fallback", _Fallback())
+    return BatchRunner(client_factory=client_factory, poll_seconds=0.01, use_cache=False,
+                       batch_dir=tmp_path / "batches", **kwargs)
+
+
+def test_batch_answers_in_request_order(stub, tmp_path):
+    runner = _runner(stub(), tmp_path)
+    assert runner.run([_request("a"), _request("b")]) == ["echo:a", "echo:b"]
+    assert runner.stats["completed"] == 2 and runner.stats["fallback"] == 0
+    assert runner.fallback.calls == []
+    assert len(list((tmp_path / "batches").glob("*.output.jsonl"))) == 1
+
+
+def test_failed_lines_fall_back_to_sync(stub, tmp_path):
+    runner = _runner(stub(), tmp_path)
+    accept = lambda content: True
+    results = runner.run([_request("a"), _request("fail-b")], accept=accept)
+    assert results == ["echo:a", "sync:fail-b"]
+    assert runner.fallback.calls == [(["fail-b"], accept)]
+    assert runner.stats["fallback"] == 1
+
+
+def test_timeout_cancels_and_falls_back(stub, tmp_path):
+    runner = _runner(stub(delay=60), tmp_path, timeout=0.05)
+    assert runner.run([_request("a"), _request("b")]) == ["sync:a", "sync:b"]
+    assert runner.stats["completed"] == 0 and runner.stats["fallback"] == 2
+
+
+def test_cache_hits_are_not_submitted_and_rejected_answers_not_cached(stub, tmp_path):
+    runner = _runner(stub(), tmp_path)
+    runner.cache = LLMCache(tmp_path / "llm.sqlite")
+    runner.cache.set(_request("a"), "cached:a")
+    results = runner.run([_request("a"), _request("b"), _request("c")], accept=lambda c: c != "echo:c")
+    assert results == ["cached:a", "echo:b", "echo:c"]
+    assert runner.stats["cached"] == 1 and runner.stats["submitted"] == 2
+    assert runner.cache.get(_request("b")) == "echo:b"
+    assert runner.cache.get(_request("c")) is None
+
+
+def test_parse_batch_output_skips_errors():
+    lines = [
+        {"custom_id": "req-0", "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "x"}}], "usage": {"total_tokens": 3}}}},
+        {"custom_id": "req-1", "response": None, "error": {"code": "e"}},
+        {"custom_id": "req-2", "response": {"status_code": 500, "body": {}}},
+        {"custom_id": "req-3", "response": {"status_code": 200, "body": {"choices": []}}},
+    ]
+    text = "\n".join(json.dumps(line) for line in lines) + "\n\n"
+    assert parse_batch_output(text) == {0: ("x", 3)}
+
+
+def test_write_batch_file_custom_ids(tmp_path):
+    path = write_batch_file([_request("a"), _request("b")], tmp_path / "in.jsonl")
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["custom_id"] for line in lines] == ["req-0", "req-1"]
+    assert lines[1]["body"] == _request("b")
+
+
+class _FlakyClient:
+    """Wraps a stub-server client; `failures[call]` calls to it raise before it starts working."""
+
+    def __init__(self, client, **failures):
+        self.failures = failures
+        self.cancelled = []
+        self.files = SimpleNamespace(create=self._wrap("files.create", client.files.create),
+                                     content=self._wrap("files.content", client.files.content))
+        self.batches = SimpleNamespace(create=self._wrap("batches.create", client.batches.create),
+                                       retrieve=self._wrap("batches.retrieve", client.batches.retrieve),
+                                       cancel=self._cancel(client.batches.cancel))
+
+    def _wrap(self, name, fn):
+        def call(*args, **kwargs):
+            if self.failures.get(name, 0):
+                self.failures[name] -= 1
+                raise openai.APIConnectionError(request=None)
+            return fn(*args, **kwargs)
+        return call
+
+    def _cancel(self, fn):
+        def call(batch_id):
+            self.cancelled.append(batch_id)
+            return fn(batch_id)
+        return call
+
+
+@pytest.mark.parametrize("failing", ["files.create", "batches.create", "files.content"])
+def test_api_errors_send_the_round_to_fallback(stub, tmp_path, failing):
+    factory = stub()
+    runner = _runner(lambda: _FlakyClient(factory(), **{failing: 1}), tmp_path)
+    assert runner.run([_request("a"), _request("b")]) == ["sync:a", "sync:b"]
+    assert runner.stats["fallback"] == 2
+
+
+def test_polling_errors_are_retried(stub, tmp_path):
+    factory = stub(delay=0.05)
+    runner = _runner(lambda: _FlakyClient(factory(), **{"batches.retrieve": 2}), tmp_path)
+    assert runner.run([_request("a")]) == ["echo:a"]
+    assert runner.stats["fallback"] == 0
+
+
+def test_polling_that_keeps_failing_cancels_and_falls_back(stub, tmp_path):
+    factory = stub(delay=60)
+    client = _FlakyClient(factory(), **{"batches.retrieve": 100})
+    runner = _runner(lambda: client, tmp_path, poll_retries=2)
+    assert runner.run([_request("a")]) == ["sync:a"]
+    assert len(client.cancelled) == 1
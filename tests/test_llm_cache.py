@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from project_code import llm_cache
+from project_code.llm_cache import LLMCache, cached_completion
+
+REQUEST = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def _valid(content):
+    return content.startswith("{")
+
+
+class _Client:
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **request):
+        self.calls += 1
+        message = SimpleNamespace(content=self.answers.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=7))
+
+
+def test_rejected_content_is_not_stored(tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite")
+    cache.set(REQUEST, "not json", 5, accept=_valid)
+    assert cache.get(REQUEST) is None
+    cache.set(REQUEST, "{}", 5, accept=_valid)
+    assert cache.get(REQUEST) == "{}"
+
+
+def test_stored_content_rejected_on_read_is_a_miss(tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite")
+    cache.set(REQUEST, "not json", 5)
+    assert cache.get(REQUEST, accept=_valid) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_cached_completion_only_replays_accepted_answers(tmp_path, monkeypatch):
+    cache = LLMCache(tmp_path / "llm.sqlite")
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: cache)
+    client = _Client(["oops", '{"a": 1}'])
+    assert cached_completion(client, accept=_valid, **REQUEST) == "oops"
+    assert cached_completion(client, accept=_valid, **REQUEST) == '{"a": 1}'
+    assert cached_completion(client, accept=_valid, **REQUEST) == '{"a": 1}'
+    assert client.calls == 2
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from project_code import llm_scheduler
+from project_code.llm_cache import LLMCache
+from project_code.llm_scheduler import LLMScheduler, _WindowBudget, estimate_tokens
+
+
+class _Transient(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("transient")
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class _AsyncClient:
+    """Answers "echo:<prompt>"; `failures[prompt]` transient errors come first."""
+
+    def __init__(self, failures=None, delay=0.0):
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.calls = []
+        self.in_flight = self.max_in_flight = 0
+        self.closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request):
+        prompt = request["messages"][0]["content"]
+        self.calls.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures.get(prompt):
+                self.failures[prompt] -= 1
+                raise _Transient(retry_after=0)
+            message = SimpleNamespace(content=f"echo:{prompt}")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=10))
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        self.closed = True
+
+
+def _request(prompt):
+    return {"model": "m", "messages": [{"role": "user", "content": prompt}], "max_tokens": 10}
+
+
+@pytest.fixture(autouse=True)
+def _fast(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "retryable_errors", lambda: (_Transient,))
+    monkeypatch.setattr(llm_scheduler, "BACKOFF_BASE", 0.001)
+
+
+def test_results_in_request_order_with_on_result():
+    client = _AsyncClient(delay=0.01)
+    scheduler = LLMScheduler(client_factory=lambda: client, use_cache=False, max_concurrency=3)
+    seen = {}
+    results = scheduler.run([_request(str(i)) for i in range(6)], on_result=seen.__setitem__)
+    assert results == [f"echo:{i}" for i in range(6)]
+    assert seen == dict(enumerate(results))
+    assert client.max_in_flight <= 3
+    assert client.closed
+
+
+def test_transient_errors_are_retried():
+    client = _AsyncClient(failures={"a": 2})
+    scheduler = LLMScheduler(client_factory=lambda: client, use_cache=False, max_retries=2)
+    assert scheduler.run([_request("a")]) == ["echo:a"]
+    assert client.calls == ["a", "a", "a"]
+    assert scheduler.stats["retries"] == 2
+
+
+def test_gives_up_after_max_retries():
+    client = _AsyncClient(failures={"a": 5})
+    scheduler = LLMScheduler(client_factory=lambda: client, use_cache=False, max_retries=1)
+    with pytest.raises(_Transient):
+        scheduler.run([_request("a")])
+    assert len(client.calls) == 2
+
+
+def test_requests_per_minute_budget(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "WINDOW_SECONDS", 0.2)
+    client = _AsyncClient()
+    scheduler = LLMScheduler(rpm=2, client_factory=lambda: client, use_cache=False)
+    started = time.monotonic()
+    scheduler.run([_request(str(i)) for i in range(4)])
+    assert time.monotonic() - started >= 0.2
+
+
+def test_oversized_reservation_is_clamped_and_settled():
+    async def scenario():
+        budget = _WindowBudget(100)
+        entry = await budget.acquire(500)
+        assert entry[1] == 100
+        budget.settle(entry, 30)
+        return budget._used(time.monotonic())
+    assert asyncio.run(scenario()) == 30
+
+
+def test_estimate_tokens():
+    assert estimate_tokens({"messages": [{"content": "x" * 40}], "max_tokens": 5}) == 15
+    assert estimate_tokens({"messages": []}) == llm_scheduler.DEFAULT_COMPLETION_TOKENS
+
+
+def test_cache_hits_skip_the_api_and_accept_filters(tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite")
+    cache.set(_request("a"), "cached:a")
+    client = _AsyncClient()
+    scheduler = LLMScheduler(client_factory=lambda: client, use_cache=False)
+    scheduler.cache = cache
+    results = scheduler.run([_request("a"), _request("b")], accept=lambda c: c != "echo:b")
+    assert results == ["cached:a", "echo:b"]
+    assert client.calls == ["b"]
+    assert cache.get(_request("b")) is None
+
+
+def test_run_inside_running_event_loop():
+    client = _AsyncClient()
+    scheduler = LLMScheduler(client_factory=lambda: client, use_cache=False)
+
+    async def caller():
+        return scheduler.run([_request("a")])
+    assert asyncio.run(caller()) == ["echo:a"]
@@ -0,0 +1,71 @@
+import json
+import re
+
+from email_project import email_summarize_chunks as esc
+
+
+def _narratives(name):
+    return json.dumps({"narratives": [{"name": name, "summary": "s", "examples": []}]})
+
+
+class _FakeRunner:
+    """
+    run_requests stand-in. A chunk request is answered with a narrative named
+    after its posts' URLs ("c:x0"), a merge with "m(A+B)" from its two inputs.
+    Merges involving a name in `broken` (and their re-asks) answer invalid JSON.
+    """
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.rounds = []
+
+    def __call__(self, requests, accept=None):
+        self.rounds.append(len(requests))
+        return [self._answer(request["messages"][1]["content"]) for request in requests]
+
+    def _answer(self, prompt):
+        if "JSON A:" in prompt:
+            a, b = (json.loads(part.strip().splitlines()[0])["narratives"][0]["name"]
+                    for part in prompt.split("JSON A:")[1].split("JSON B:"))
+            if {a, b} & self.broken:
+                return "not json"
+            return _narratives(f"m({a}+{b})")
+        urls = re.findall(r"\(https://example\.com/([^)]+)\)", prompt)
+        return _narratives("c:" + ",".join(urls))
+
+
+def _chunks(platform, n):
+    return [[{"cleaned_caption": "text", "author": "a", "url": f"https://example.com/{platform}{i}"}]
+            for i in range(n)]
+
+
+def _name(result):
+    return result["narratives"][0]["name"]
+
+
+def test_balanced_tree_with_odd_candidates_and_empty_platform():
+    runner = _FakeRunner()
+    finals = esc._map_reduce({"x": _chunks("x", 5), "y": _chunks("y", 1), "z": []}, "m", 0.0,
+                             run_requests=runner)
+    # Level 1 merges x0+x1 and x2+x3 while x4 moves up unchanged, and so on
+    assert _name(finals["x"]) == "m(m(m(c:x0+c:x1)+m(c:x2+c:x3))+c:x4)"
+    assert _name(finals["y"]) == "c:y0"
+    assert finals["z"] == {"narratives": []}
+    # One map round for every chunk of every platform, then one round per tree level
+    assert runner.rounds == [6, 2, 1, 1]
+
+
+def test_failed_merge_carries_its_first_input_up():
+    runner = _FakeRunner(broken={"c:x3"})
+    finals = esc._map_reduce({"x": _chunks("x", 4)}, "m", 0.0, run_requests=runner)
+    assert _name(finals["x"]) == "m(m(c:x0+c:x1)+c:x2)"
+    # The broken merge is re-asked once in its own round before giving up
+    assert runner.rounds == [4, 2, 1, 1]
+
+
+def test_levels_run_across_platforms_together():
+    runner = _FakeRunner()
+    finals = esc._map_reduce({"x": _chunks("x", 2), "y": _chunks("y", 3)}, "m", 0.0, run_requests=runner)
+    assert _name(finals["x"]) == "m(c:x0+c:x1)"
+    assert _name(finals["y"]) == "m(m(c:y0+c:y1)+c:y2)"
+    assert runner.rounds == [5, 2, 1]
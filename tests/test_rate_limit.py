@@ -0,0 +1,26 @@
+import time
+
+import pytest
+
+from project_code.rate_limit import TokenBucket, make_limiters
+
+
+def test_acquire_more_than_capacity_raises():
+    bucket = TokenBucket(rate=100, capacity=2)
+    with pytest.raises(ValueError):
+        bucket.acquire(3)
+    bucket.acquire(2)  # exactly the capacity is fine
+
+
+def test_acquire_waits_for_refill():
+    bucket = TokenBucket(rate=50, capacity=1)
+    bucket.acquire()
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.015
+
+
+def test_make_limiters_rate_and_burst():
+    limiters = make_limiters(["a", "b"], {"a": (5, 3)}, default_rate=2)
+    assert (limiters["a"].rate, limiters["a"].capacity) == (5.0, 3.0)
+    assert (limiters["b"].rate, limiters["b"].capacity) == (2.0, 1.0)
@@ -0,0 +1,44 @@
+import time
+from datetime import datetime, timezone
+
+from project_code import forum_scout_multiple as fsm
+
+ENDPOINTS = {
+    "instagram": "instagram_search",
+    "reddit_posts": "reddit_posts_search",
+    "reddit_comments": "reddit_comments_search",
+    "x_search": "x_search",
+}
+KEYWORDS = [f"kw{i}" for i in range(10)]
+RATE = 20.0
+
+
+def _fake_fetch(endpoint, keyword, sort_by=None, recency=None, use_cache=None, limiter=None, page=None):
+    if limiter is not None:
+        limiter.acquire()
+    now = datetime.now(timezone.utc).isoformat()
+    return [{"url": f"https://{endpoint}/{keyword}", "text": keyword, "date": now}]
+
+
+def test_platforms_run_side_by_side_and_keep_order(monkeypatch):
+    monkeypatch.setattr(fsm, "fetch_forumscout_data", _fake_fetch)
+    started = time.monotonic()
+    df = fsm.run_ingestion(KEYWORDS, ENDPOINTS, output_file=None, max_workers=4,
+                           rate_limits={p: RATE for p in ENDPOINTS})
+    elapsed = time.monotonic() - started
+
+    # Each platform alone needs (keywords - 1) / rate seconds; run one after
+    # another they would take about len(ENDPOINTS) times that
+    slowest = (len(KEYWORDS) - 1) / RATE
+    assert elapsed < slowest * 2, f"{elapsed:.2f}s for a slowest platform of {slowest:.2f}s"
+    expected = [(p, kw) for p in ENDPOINTS for kw in KEYWORDS]
+    assert list(zip(df["platform"], df["keyword"])) == expected
+
+
+def test_sequential_run_matches_concurrent_order(monkeypatch):
+    monkeypatch.setattr(fsm, "fetch_forumscout_data", _fake_fetch)
+    rate_limits = {p: 1000.0 for p in ENDPOINTS}
+    concurrent = fsm.run_ingestion(KEYWORDS[:3], ENDPOINTS, output_file=None, rate_limits=rate_limits)
+    sequential = fsm.run_ingestion(KEYWORDS[:3], ENDPOINTS, output_file=None, rate_limits=rate_limits,
+                                   concurrent=False)
+    assert concurrent["url"].tolist() == sequential["url"].tolist()
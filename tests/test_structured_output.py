@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+
+from project_code.structured_output import extract_json, parse_structured, schema_errors
+
+SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["narratives"],
+    "properties": {
+        "narratives": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["name", "count"],
+                "properties": {"name": {"type": "string"}, "count": {"type": "integer"}},
+            },
+        },
+    },
+}
+
+
+def test_whole_text_object():
+    assert extract_json('{"a": 1}') == {"a": 1}
+
+
+def test_object_inside_prose_and_fences():
+    text = 'Here you go:\n```json\n{"a": {"b": "}"}, "c": [1, 2]}\n```\nThanks {not json'
+    assert extract_json(text) == {"a": {"b": "}"}, "c": [1, 2]}
+
+
+def test_skips_unbalanced_brace_before_object():
+    assert extract_json('see {this, and then {"ok": true} and {"later": 1}') == {"ok": True}
+
+
+def test_no_object_raises():
+    for text in ["", None, "no braces here", "[1, 2]", "{ still not json"]:
+        with pytest.raises(ValueError):
+            extract_json(text)
+
+
+def test_valid_object_before_the_error_is_found():
+    assert extract_json('{"x": {"a": 1}, oops}') == {"a": 1}
+
+
+def test_deep_nesting_is_a_value_error():
+    deep = '{"a":' * 200000 + "1" + "}" * 200000
+    with pytest.raises(ValueError):
+        extract_json(deep)
+    assert extract_json(deep + ' {"ok": 1}') == {"ok": 1}
+
+
+@pytest.mark.parametrize("text", [
+    '{"a":' * 360000,
+    '{"a": x ' * 100000 + "}" * 100000,
+    '{"a": 1,}' * 50000 + ' {"ok": 1}',
+], ids=["nested-unterminated", "every-level-broken", "broken-siblings"])
+def test_pathological_input_stays_linear(text):
+    started = time.perf_counter()
+    try:
+        extract_json(text)
+    except ValueError:
+        pass
+    assert time.perf_counter() - started < 2.0
+
+
+def test_nested_non_json_braces_are_not_reparsed():
+    # Thousands of nested spans that are not JSON: each start fails at once
+    text = "{x" * 20000 + ' {"a": 1} ' + "}" * 20000
+    started = time.perf_counter()
+    assert extract_json(text) == {"a": 1}
+    assert time.perf_counter() - started < 2.0
+
+
+def test_schema_errors_paths():
+    value = {"narratives": [{"name": "x", "count": True}, {"name": 3}], "extra": 1}
+    errors = schema_errors(value, SCHEMA)
+    assert "$: unexpected 'extra'" in errors
+    assert "$.narratives[0].count: expected integer, got bool" in errors
+    assert "$.narratives[1]: missing 'count'" in errors
+    assert "$.narratives[1].name: expected string, got int" in errors
+
+
+def test_parse_structured_valid_and_invalid():
+    good = {"narratives": [{"name": "x", "count": 2}]}
+    assert parse_structured("Sure: " + json.dumps(good), SCHEMA) == good
+    with pytest.raises(ValueError, match="missing 'narratives'"):
+        parse_structured('{"other": []}', SCHEMA)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from project_code.worker_pool import HostLimitedPool
+
+
+class _Probe:
+    """Records when each host's tasks start and the most that ran at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.first_start = {}
+        self.running = {}
+        self.peak = {}
+
+    def task(self, host, seconds):
+        with self.lock:
+            self.first_start.setdefault(host, time.monotonic() - self.started)
+            self.running[host] = self.running.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.running[host])
+        time.sleep(seconds)
+        with self.lock:
+            self.running[host] -= 1
+        return host
+
+
+def test_backlogged_host_does_not_block_other_hosts():
+    probe = _Probe()
+    with HostLimitedPool({"slow.com": 2, "fast.com": 4}, max_workers=8) as pool:
+        slow = [pool.submit("slow.com", probe.task, "slow.com", 0.05) for _ in range(20)]
+        fast = [pool.submit("fast.com", probe.task, "fast.com", 0.05) for _ in range(8)]
+    assert [f.result() for f in slow + fast] == ["slow.com"] * 20 + ["fast.com"] * 8
+    # fast.com gets workers right away instead of queueing behind slow.com's backlog
+    assert probe.first_start["fast.com"] < 0.1
+    assert probe.peak == {"slow.com": 2, "fast.com": 4}
+
+
+def test_default_limit_and_exceptions():
+    probe = _Probe()
+
+    def boom():
+        raise RuntimeError("boom")
+
+    with HostLimitedPool(default_limit=1, max_workers=4) as pool:
+        results = [pool.submit("other.com", probe.task, "other.com", 0.01) for _ in range(3)]
+        failed = pool.submit("other.com", boom)
+    assert probe.peak["other.com"] == 1
+    assert all(f.result() == "other.com" for f in results)
+    with pytest.raises(RuntimeError):
+        failed.result()
+
+
+def test_shutdown_without_wait_cancels_queued_tasks():
+    gate = threading.Event()
+    pool = HostLimitedPool({"a.com": 1}, max_workers=2)
+    running = pool.submit("a.com", gate.wait)
+    queued = pool.submit("a.com", gate.wait)
+    try:
+        pool.shutdown(wait=False)
+        assert queued.cancelled()
+    finally:
+        gate.set()
+    assert running.result() is True
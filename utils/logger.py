@@ -8,7 +8,8 @@
 #     """, height=0)
 
 
-import streamlit as st
+# streamlit is imported on first call so headless runs never load it
+from project_code import clients
 
 # def log_to_browser(message):
 #     st.markdown(f"""
@@ -19,6 +20,7 @@ import streamlit as st
 
 def log_to_browser(message):
     # Create an empty container that won't take up space
+    st = clients.streamlit()
     log_container = st.empty()
     log_container.markdown(f"""
     <script>